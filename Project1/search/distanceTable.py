@@ -0,0 +1,174 @@
+# distanceTable.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+This file contains a DistanceTable object which holds the shortest maze
+distance between every pair of open cells of a layout.
+
+Example:
+table = getDistanceTable(gameState.getWalls())
+table.getDistance( (1,1), (10,10) )
+
+Every open cell gets an integer id, and the distances are stored in a
+single flat array indexed by id1 * numCells + id2, filled in by running a
+breadth first search from every open cell.  Tables are shared by every
+caller in the process (see distanceTables) and saved to disk in
+DISTANCE_CACHE_DIR under the hash of the walls, so a layout is normally
+only solved once.
+"""
+
+import array
+import hashlib
+import os
+import tempfile
+import zlib
+
+UNREACHABLE = 65535
+DISTANCE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'pacmanDistances')
+
+class DistanceTable:
+    """
+    All-pairs maze distances over the open cells of a walls Grid.
+    """
+
+    def __init__(self, walls, distances=None):
+        self.cells = walls.asList(False)
+        self.cellIds = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.numCells = len(self.cells)
+        if distances == None:
+            distances = self._computeDistances(walls)
+        self.distances = distances
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance between two open cells, or UNREACHABLE if
+        no path connects them.
+        """
+        return self.distances[self.cellIds[pos1] * self.numCells + self.cellIds[pos2]]
+
+    def getCellId(self, pos):
+        return self.cellIds[pos]
+
+    def getDistanceById(self, id1, id2):
+        return self.distances[id1 * self.numCells + id2]
+
+    def _computeDistances(self, walls):
+        n = self.numCells
+        neighbors = []
+        for x, y in self.cells:
+            adjacent = []
+            for nextx, nexty in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if not walls[nextx][nexty]:
+                    adjacent.append(self.cellIds[(nextx, nexty)])
+            neighbors.append(adjacent)
+
+        distances = array.array('H', [UNREACHABLE]) * (n * n)
+        for source in range(n):
+            row = source * n
+            distances[row + source] = 0
+            layer = [source]
+            depth = 0
+            while layer:
+                depth += 1
+                nextLayer = []
+                for cell in layer:
+                    for other in neighbors[cell]:
+                        if distances[row + other] == UNREACHABLE:
+                            distances[row + other] = depth
+                            nextLayer.append(other)
+                layer = nextLayer
+        return distances
+
+##########################################
+# MACHINERY FOR SHARING DISTANCE TABLES  #
+##########################################
+
+distanceTables = {}
+
+def wallsKey(walls):
+    "A hash of the walls that identifies a layout's distance table"
+    return hashlib.sha1('%d %d\n%s' % (walls.width, walls.height, walls)).hexdigest()
+
+def getDistanceTable(walls):
+    """
+    Returns the DistanceTable for the given walls, loading it from the
+    in-process or on-disk cache when possible.  A cache file that is
+    missing or fails the checks in loadDistances is written again.
+    """
+    key = wallsKey(walls)
+    if key not in distanceTables:
+        path = os.path.join(DISTANCE_CACHE_DIR, key + '.dist')
+        distances = loadDistances(path, walls, key)
+        table = DistanceTable(walls, distances)
+        if distances == None:
+            saveDistances(path, key, table.distances)
+        distanceTables[key] = table
+    return distanceTables[key]
+
+def loadDistances(path, walls, key):
+    """
+    Reads a saved distance array, or returns None if it is missing, stale or
+    damaged.  The file starts with a line holding the walls key and the
+    CRC-32 of the distances, must hold exactly one distance per pair of open
+    cells, and is spot-checked: every cell must be 0 from itself and 1 from
+    its open neighbors, and some pairs must read the same both ways.
+    """
+    cells = walls.asList(False)
+    numCells = len(cells)
+    distances = array.array('H')
+    try:
+        f = open(path, 'rb')
+        try:
+            header = f.readline().split()
+            if len(header) != 2 or header[0] != key:
+                return None
+            distances.fromfile(f, numCells * numCells)
+            if f.read(1) != '' or header[1] != checksum(distances):
+                return None
+        finally:
+            f.close()
+    except (IOError, OSError, EOFError):
+        return None
+    cellIds = dict((cell, i) for i, cell in enumerate(cells))
+    for i, (x, y) in enumerate(cells):
+        row = i * numCells
+        if distances[row + i] != 0:
+            return None
+        for neighbor in ((x + 1, y), (x, y + 1)):
+            if neighbor in cellIds and distances[row + cellIds[neighbor]] != 1:
+                return None
+        j = (i * 7919 + 1) % numCells
+        if distances[row + j] != distances[j * numCells + i]:
+            return None
+    return distances
+
+def checksum(distances):
+    return '%08x' % (zlib.crc32(distances.tostring()) & 0xffffffff)
+
+def saveDistances(path, key, distances):
+    "Writes a distance array under its walls key; failing to do so is not an error"
+    try:
+        if not os.path.isdir(DISTANCE_CACHE_DIR):
+            os.makedirs(DISTANCE_CACHE_DIR)
+        tmpPath = '%s.%d.tmp' % (path, os.getpid())
+        f = open(tmpPath, 'wb')
+        try:
+            f.write('%s %s\n' % (key, checksum(distances)))
+            distances.tofile(f)
+        finally:
+            f.close()
+        os.rename(tmpPath, path)
+    except (IOError, OSError):
+        pass
@@ -23,6 +23,10 @@
 
 from util import *
 import time, os
+import random
+import string
+import itertools
+import operator
 import traceback
 import sys
 
@@ -158,71 +162,99 @@ class AgentState:
     def getDirection(self):
         return self.configuration.getDirection()
 
-class Grid:
+class Grid(list):
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans.  Data is accessed via grid[x][y] where
+    (x,y) are positions on a Pacman map with x horizontal, y vertical and the
+    origin (0,0) in the bottom left corner.
+
+    The grid is the list of its columns and each column is a list of bools,
+    so grid[x][y] needs no Python call and reads back True or False.
+    Counting, hashing and packing the grid run over whole columns instead
+    of cell by cell.  The hash is computed from the cells on every call, so
+    it stays right however the grid is changed.
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
+    __slots__ = ('width', 'height')
+    CELLS_PER_INT = 30
+
     def __init__(self, width, height, initialValue=False, bitRepresentation=None):
         if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
-        self.CELLS_PER_INT = 30
-
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(height)] for x in range(width)]
+        self.extend([[initialValue] * height for x in range(width)])
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
-    def __getitem__(self, i):
-        return self.data[i]
+    # The list of columns, kept for code written against the list of lists
+    data = property(lambda self: self)
 
-    def __setitem__(self, key, item):
-        self.data[key] = item
+    def __reduce__(self):
+        return (Grid, (self.width, self.height, False, self.packBits()[2:]))
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        columns = [self._columnBytes(column).translate(_CELL_CHARS) for column in self]
+        out = [''.join([column[y] for column in columns]) for y in range(self.height)]
         out.reverse()
-        return '\n'.join([''.join(x) for x in out])
+        return '\n'.join(out)
 
     def __eq__(self, other):
-        if other == None: return False
-        return self.data == other.data
+        if not isinstance(other, Grid): return False
+        return list.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(tuple(map(tuple, self)))
 
     def copy(self):
-        g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
-        return g
+        return self._withData([x[:] for x in self])
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
+        return self._withData(self)
+
+    def copyColumn(self, x):
+        """
+        Returns a copy that shares every column with this grid except column
+        x, which gets its own list.  Only cells in column x of the copy may
+        be changed, which costs O(height) instead of copying the whole grid.
+        """
+        g = self._withData(self)
+        g[x] = self[x][:]
+        return g
+
+    def _withData(self, columns):
+        "A grid of the same size holding the given columns, which are not copied"
+        g = Grid(0, 0)
+        g.width = self.width
+        g.height = self.height
+        g.extend(columns)
         return g
 
+    def _columnBytes(self, column):
+        "The cells of a column as a string of '\\x00' and '\\x01' characters"
+        return str(bytearray(column))
+
+    def _cellBytes(self):
+        "Every cell in packBits order as a string of '\\x00' and '\\x01' characters"
+        return str(bytearray(itertools.chain.from_iterable(self)))
+
     def count(self, item =True ):
-        return sum([x.count(item) for x in self.data])
+        if item not in [False, True]: return 0
+        return sum([x.count(item) for x in self])
 
     def asList(self, key = True):
+        if key not in [False, True]: return []
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: list.append( (x,y) )
+        rows = range(self.height)
+        for x, column in enumerate(self):
+            if not key: column = map(operator.not_, column)
+            list.extend([(x, y) for y in itertools.compress(rows, column)])
         return list
 
     def packBits(self):
@@ -231,17 +263,13 @@ class Grid:
 
         (width, height, bitPackedInts...)
         """
+        size = self.CELLS_PER_INT
+        cells = self._cellBytes().translate(_CELL_BITS)
         bits = [self.width, self.height]
-        currentInt = 0
-        for i in range(self.height * self.width):
-            bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
-                currentInt += 2 ** bit
-            if (i + 1) % self.CELLS_PER_INT == 0:
-                bits.append(currentInt)
-                currentInt = 0
-        bits.append(currentInt)
+        for start in range(0, len(cells), size):
+            bits.append(int(cells[start:start + size].ljust(size, '0'), 2))
+        if len(cells) % size == 0:
+            bits.append(0)
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
@@ -253,25 +281,154 @@ class Grid:
         """
         Fills in data from a bit-level representation
         """
-        cell = 0
-        for packed in bits:
-            for bit in self._unpackInt(packed, self.CELLS_PER_INT):
-                if cell == self.width * self.height: break
-                x, y = self._cellIndexToPosition(cell)
-                self[x][y] = bit
-                cell += 1
+        cells = ''.join([self._unpackInt(packed, self.CELLS_PER_INT) for packed in bits])
+        cells = cells[:self.width * self.height].ljust(self.width * self.height, '0')
+        cells = [cell == '1' for cell in cells]
+        height = self.height
+        self[:] = [cells[x * height:(x + 1) * height] for x in range(self.width)]
 
     def _unpackInt(self, packed, size):
-        bools = []
+        "The size lowest bits of packed as a string of '0' and '1', highest first"
         if packed < 0: raise ValueError, "must be a positive integer"
-        for i in range(size):
-            n = 2 ** (self.CELLS_PER_INT - i - 1)
-            if packed >= n:
-                bools.append(True)
-                packed -= n
-            else:
-                bools.append(False)
-        return bools
+        return bin(packed)[2:].zfill(size)[-size:]
+
+def _refuseChange(self, *args):
+    raise TypeError('this grid is read-only; change a copy() of it instead')
+
+class ReadOnlyGrid(Grid):
+    """
+    A Grid whose cells can not be changed, for boards that many game states
+    share, such as the walls of a Layout.  Assigning to grid[x] or
+    grid[x][y] raises a TypeError.  copy() and deepCopy() return an ordinary
+    Grid that can be changed.
+    """
+    __slots__ = ()
+
+    def __init__(self, grid):
+        self.width = grid.width
+        self.height = grid.height
+        list.extend(self, [ReadOnlyColumn(column) for column in grid])
+
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = _refuseChange
+    __iadd__ = __imul__ = append = extend = insert = pop = remove = reverse = sort = _refuseChange
+
+class ReadOnlyColumn(list):
+    "A column of a ReadOnlyGrid; it reads like a list of bools and can not be changed"
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = _refuseChange
+    __iadd__ = __imul__ = append = extend = insert = pop = remove = reverse = sort = _refuseChange
+
+_CELL_CHARS = string.maketrans('\x00\x01', 'FT')
+_CELL_BITS = string.maketrans('\x00\x01', '01')
+
+class Bitboard(object):
+    """
+    An immutable set of grid cells packed into a single integer, one bit per
+    cell.  Cell (x,y) is bit x * height + y, the same cell order Grid uses for
+    packBits, so asList() returns positions in the same order as Grid.asList().
+
+    Hashing and equality only look at the integer, removing a cell returns a
+    new Bitboard, and the number of set cells is kept alongside the bits so
+    count() never has to scan the board.
+
+    It reads like a Grid of booleans: board[x][y], asList(key), count(item),
+    width and height all work, and copy() returns a Grid that can be changed.
+    """
+    __slots__ = ('width', 'height', 'bits', '_count')
+
+    def __init__(self, width, height, bits=0, count=None):
+        self.width = width
+        self.height = height
+        self.bits = bits
+        if count == None:
+            count = bin(bits).count('1')
+        self._count = count
+
+    def fromGrid(grid):
+        "Builds a Bitboard holding the True cells of a Grid"
+        cells = grid._cellBytes().translate(_CELL_BITS)
+        return Bitboard(grid.width, grid.height, int(cells[::-1] or '0', 2))
+    fromGrid = staticmethod(fromGrid)
+
+    def hasCell(self, x, y):
+        return (self.bits >> (x * self.height + y)) & 1 == 1
+
+    def __contains__(self, pos):
+        return self.hasCell(pos[0], pos[1])
+
+    def __getitem__(self, x):
+        "Column x, so that board[x][y] reads like a Grid"
+        if x < 0: x += self.width
+        if x < 0 or x >= self.width: raise IndexError('Bitboard column out of range')
+        height = self.height
+        return BitboardColumn((self.bits >> (x * height)) & ((1 << height) - 1), height)
+
+    def remove(self, x, y):
+        "Returns a Bitboard without cell (x,y), or self if it was not set"
+        bit = 1 << (x * self.height + y)
+        if not self.bits & bit:
+            return self
+        return Bitboard(self.width, self.height, self.bits ^ bit, self._count - 1)
+
+    def count(self, item=True):
+        if item == True: return self._count
+        if item == False: return self.width * self.height - self._count
+        return 0
+
+    def asList(self, key=True):
+        if key == False: return self.toGrid().asList(False)
+        if key != True: return []
+        cells = []
+        bits = self.bits
+        height = self.height
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            cells.append((index // height, index % height))
+            bits ^= low
+        return cells
+
+    def toGrid(self):
+        grid = Grid(self.width, self.height)
+        for x, y in self.asList():
+            grid[x][y] = True
+        return grid
+
+    def copy(self):
+        "A Grid with the same cells, which (unlike the Bitboard) can be changed"
+        return self.toGrid()
+
+    def deepCopy(self):
+        return self.copy()
+
+    def __eq__(self, other):
+        return isinstance(other, Bitboard) and self.bits == other.bits
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __str__(self):
+        return str(self.toGrid())
+
+class BitboardColumn(object):
+    "A read-only column of a Bitboard, indexed by y like a Grid column"
+    __slots__ = ('bits', 'height')
+
+    def __init__(self, bits, height):
+        self.bits = bits
+        self.height = height
+
+    def __getitem__(self, y):
+        if y < 0: y += self.height
+        if y < 0 or y >= self.height: raise IndexError('Bitboard row out of range')
+        return (self.bits >> y) & 1 == 1
+
+    def __len__(self):
+        return self.height
 
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
@@ -367,9 +524,27 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
-class GameStateData:
+ZOBRIST_KEYS = {}
+_zobristRandom = random.Random(188)
+
+def zobristKey(feature):
+    """
+    The random 64 bit key of a feature of a game state, such as ('food', x, y).
+    Keys are drawn the first time a feature is seen and are the same for the
+    rest of the process.
     """
+    key = ZOBRIST_KEYS.get(feature)
+    if key == None:
+        key = ZOBRIST_KEYS[feature] = _zobristRandom.getrandbits(64)
+    return key
 
+class GameStateData:
+    """
+    The data of a game state.  Besides the board it keeps a Zobrist key of
+    the food and capsules (boardKey): the XOR of zobristKey(('food', x, y))
+    over the food and zobristKey(('capsule', x, y)) over the capsules.  Code
+    that eats food or capsules toggles their keys (see PacmanRules.consume),
+    so getZobristKey() never has to look at the whole board.
     """
     def __init__( self, prevState = None ):
         """
@@ -382,6 +557,9 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self.boardKey = prevState.boardKey
+        else:
+            self.boardKey = 0
 
         self._foodEaten = None
         self._foodAdded = None
@@ -394,7 +572,7 @@ class GameStateData:
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        # Layouts never change during a game, so copies share one (see layout.py)
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -413,27 +591,40 @@ class GameStateData:
         """
         if other == None: return False
         # TODO Check for type of other
+        if self.boardKey != other.boardKey: return False
         if not self.agentStates == other.agentStates: return False
         if not self.food == other.food: return False
         if not self.capsules == other.capsules: return False
         if not self.score == other.score: return False
         return True
 
+    def getZobristKey( self ):
+        """
+        A 64 bit key of everything __eq__ compares: the board key, each
+        agent's position, direction and scared timer, and the score.  It
+        costs one lookup per agent, so it is cheap enough for transposition
+        tables.
+        """
+        key = self.boardKey ^ zobristKey(('score', self.score))
+        for index, agentState in enumerate( self.agentStates ):
+            # 'is None' skips the Python __eq__ of AgentState and Configuration
+            if agentState is None: continue
+            configuration = agentState.configuration
+            if configuration is None:
+                key ^= zobristKey(('agent', index, None, None, agentState.scaredTimer))
+            else:
+                key ^= zobristKey(('agent', index, configuration.pos, configuration.direction, agentState.scaredTimer))
+        return key
+
     def __hash__( self ):
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError, e:
-                print e
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        return hash( self.getZobristKey() )
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
+        map = [[' '] * height for x in range(width)]
         if type(self.food) == type((1,2)):
             self.food = reconstituteGrid(self.food)
         for x in range(width):
@@ -454,7 +645,8 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        rows = [''.join([map[x][y] for x in range(width)]) for y in range(height - 1, -1, -1)]
+        return '\n'.join(rows) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr( self, hasFood, hasWall ):
         if hasFood:
@@ -490,6 +682,11 @@ class GameStateData:
         self.food = layout.food.copy()
         self.capsules = layout.capsules[:]
         self.layout = layout
+        self.boardKey = 0
+        for x, y in self.food.asList():
+            self.boardKey ^= zobristKey(('food', x, y))
+        for x, y in self.capsules:
+            self.boardKey ^= zobristKey(('capsule', x, y))
         self.score = 0
         self.scoreChange = 0
 
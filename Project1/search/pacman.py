@@ -44,6 +44,7 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import zobristKey
 from util import nearestPoint
 from util import manhattanDistance
 import util, layout
@@ -72,14 +73,34 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
+    # static variable keeps track of which states have been generated while
+    # explored tracking is on (see trackExplored)
     explored = set()
+
+    # Instrumentation hooks, each called as hook(state, successor) for every
+    # successor generated.  There are none by default, so games and training
+    # runs neither hash every state nor keep them all.
+    successorHooks = []
+
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
+        """
+        Returns the states generated since the last call and starts a new set.
+        The first call turns explored tracking on, so the autograder's tests,
+        which reset the set before running an agent, see its states.
+        """
+        if GameState.trackExplored not in GameState.successorHooks:
+            GameState.successorHooks.append(GameState.trackExplored)
+        tmp = GameState.explored
         GameState.explored = set()
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+    def trackExplored(state, successor):
+        "The successor hook that adds both states to GameState.explored"
+        GameState.explored.add(state)
+        GameState.explored.add(successor)
+    trackExplored = staticmethod(trackExplored)
+
     def getLegalActions( self, agentIndex=0 ):
         """
         Returns the legal actions for the agent specified.
@@ -121,8 +142,8 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        for hook in GameState.successorHooks:
+            hook(self, state)
         return state
 
     def getLegalPacmanActions( self ):
@@ -362,9 +383,10 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
+            state.data.food = state.data.food.copyColumn(x)
             state.data.food[x][y] = False
             state.data._foodEaten = position
+            state.data.boardKey ^= zobristKey(('food', x, y))
             # TODO: cache numFood?
             numFood = state.getNumFood()
             if numFood == 0 and not state.data._lose:
@@ -374,6 +396,7 @@ class PacmanRules:
         if( position in state.getCapsules() ):
             state.data.capsules.remove( position )
             state.data._capsuleEaten = position
+            state.data.boardKey ^= zobristKey(('capsule', x, y))
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
                 state.data.agentStates[index].scaredTimer = SCARED_TIME
@@ -19,6 +19,8 @@ by Pacman agents (in searchAgents.py).
 """
 
 import util
+import heapq
+from collections import OrderedDict
 
 class SearchProblem:
     """
@@ -78,21 +80,37 @@ def tinyMazeSearch(problem):
 
 
 def generalUninformedSearch(problem, frontier):
+    """
+    Graph search over the given frontier.  Frontier entries are triples
+    (state, nodeId, cost) where nodeId refers to a node in a util.NodeStore;
+    the action list is only rebuilt once a goal state is popped.
+    """
     explored = set()
-    frontier.push((problem.getStartState(), [], 0))
+    nodes = util.NodeStore()
+    frontier.push((problem.getStartState(), nodes.add(util.NodeStore.ROOT, None), 0))
+    pushes, maxFrontier = 1, 1
 
     while not frontier.isEmpty():
-        (node, path, cost) = frontier.pop()
+        (node, nodeId, cost) = frontier.pop()
         if problem.isGoalState(node):
-            return path
+            recordFrontierStats(problem, pushes, maxFrontier)
+            return nodes.getPath(nodeId)
         if node not in explored:
             explored.add(node)
             for (newstate, action, newcost) in problem.getSuccessors(node):
                 if newstate not in explored:
-                    frontier.push((newstate, path + [action], cost + newcost))
+                    frontier.push((newstate, nodes.add(nodeId, action), cost + newcost))
+                    pushes += 1
+            maxFrontier = max(maxFrontier, len(frontier))
 
+    recordFrontierStats(problem, pushes, maxFrontier)
     return []
 
+def recordFrontierStats(problem, pushes, maxFrontier):
+    "Stores frontier bookkeeping on the problem, next to its _expanded count"
+    problem._frontierPushes = pushes
+    problem._maxFrontier = maxFrontier
+
 
 def depthFirstSearch(problem):
     "Search the deepest nodes in the search tree first"
@@ -115,13 +133,575 @@ def nullHeuristic(state, problem=None):
     """
     return 0
 
+class CachedHeuristic:
+    """
+    Wraps a heuristic so that repeated calls on an identical state cost a
+    dictionary lookup.  At most maxSize results are kept; the least recently
+    used one is evicted first.  The cache is cleared whenever the heuristic
+    is called with a different problem.  hits and misses count lookups.
+    """
+    def __init__(self, heuristic, maxSize=100000):
+        self.heuristic = heuristic
+        self.maxSize = maxSize
+        self.cache = OrderedDict()
+        self.problem = None
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, state, problem=None):
+        if problem is not self.problem:
+            self.cache.clear()
+            self.problem = problem
+        if state in self.cache:
+            self.hits += 1
+            value = self.cache.pop(state)
+        else:
+            self.misses += 1
+            value = self.heuristic(state, problem)
+            if len(self.cache) >= self.maxSize:
+                self.cache.popitem(last=False)
+        self.cache[state] = value
+        return value
+
 def aStarSearch(problem, heuristic=nullHeuristic):
     "Search the node that has the lowest combined cost and heuristic first."
     return generalUninformedSearch(problem, util.PriorityQueueWithFunction(lambda tup: tup[2] + heuristic(tup[0], problem)))
 
+def generalBestFirstSearch(problem, heuristic=nullHeuristic):
+    """
+    Graph search whose frontier is a util.IndexedPriorityQueue holding at most
+    one entry per state.  The best known cost to each state is kept in bestG;
+    rediscovering a state on a cheaper path lowers its priority in place
+    instead of pushing a duplicate, and expanded states are never reopened
+    (which requires a consistent heuristic).
+    """
+    explored = set()
+    nodes = util.NodeStore()
+    frontier = util.IndexedPriorityQueue()
+    start = problem.getStartState()
+    bestG = {start: 0}
+    bestNode = {start: nodes.add(util.NodeStore.ROOT, None)}
+    frontier.push(start, heuristic(start, problem))
+
+    while not frontier.isEmpty():
+        node = frontier.pop()
+        if problem.isGoalState(node):
+            recordFrontierStats(problem, frontier.pushes, frontier.maxSize)
+            return nodes.getPath(bestNode[node])
+        explored.add(node)
+        cost = bestG[node]
+        for (newstate, action, newcost) in problem.getSuccessors(node):
+            if newstate in explored:
+                continue
+            g = cost + newcost
+            if newstate not in bestG or g < bestG[newstate]:
+                bestG[newstate] = g
+                bestNode[newstate] = nodes.add(bestNode[node], action)
+                frontier.update(newstate, g + heuristic(newstate, problem))
+
+    recordFrontierStats(problem, frontier.pushes, frontier.maxSize)
+    return []
+
+def uniformCostSearchDecreaseKey(problem):
+    "Uniform cost search with one frontier entry per state."
+    return generalBestFirstSearch(problem)
+
+def aStarSearchDecreaseKey(problem, heuristic=nullHeuristic):
+    "A* search with one frontier entry per state."
+    return generalBestFirstSearch(problem, heuristic)
+
+
+def idaStarSearch(problem, heuristic=nullHeuristic, tableSize=1000):
+    """
+    Iterative-deepening A*: repeated depth first searches that prune every
+    node whose f = g + h exceeds a bound, raising the bound to the smallest
+    pruned f after each pass.  States on the current path are skipped to
+    avoid cycles, at the price of re-expanding nodes on every pass.
+
+    Each pass also keeps a transposition table of the cheapest g found for
+    up to tableSize recently reached states and skips a state reached again
+    at no lower cost, which keeps the passes from enumerating every path
+    through open areas.  Memory is linear in the solution depth plus
+    tableSize entries: a larger table saves more re-expansions, and
+    tableSize=0 gives plain IDA*.
+    """
+    start = problem.getStartState()
+    if problem.isGoalState(start):
+        return []
+    bound = heuristic(start, problem)
+    pushes, maxFrontier = 1, 1
+
+    while True:
+        nextBound = None
+        path, actions, costs = [start], [], [0]
+        onPath = set(path)
+        bestCost = OrderedDict()
+        successors = [iter(problem.getSuccessors(start))]
+        while successors:
+            try:
+                (newstate, action, newcost) = successors[-1].next()
+            except StopIteration:
+                successors.pop()
+                onPath.discard(path.pop())
+                costs.pop()
+                if actions:
+                    actions.pop()
+                continue
+            if newstate in onPath:
+                continue
+            g = costs[-1] + newcost
+            if newstate in bestCost:
+                # Move the entry to the recently used end
+                if bestCost.pop(newstate) <= g:
+                    bestCost[newstate] = g
+                    continue
+            f = g + heuristic(newstate, problem)
+            if f > bound:
+                if nextBound == None or f < nextBound:
+                    nextBound = f
+                continue
+            if problem.isGoalState(newstate):
+                recordFrontierStats(problem, pushes, maxFrontier)
+                return actions + [action]
+            if tableSize > 0:
+                if len(bestCost) >= tableSize:
+                    bestCost.popitem(last=False)
+                bestCost[newstate] = g
+            path.append(newstate)
+            onPath.add(newstate)
+            actions.append(action)
+            costs.append(g)
+            successors.append(iter(problem.getSuccessors(newstate)))
+            pushes += 1
+            maxFrontier = max(maxFrontier, len(successors))
+
+        if nextBound == None:
+            recordFrontierStats(problem, pushes, maxFrontier)
+            return []
+        bound = nextBound
+
+class SMANode:
+    "A search tree node of smaStarSearch; nodes are dropped and regenerated"
+    def __init__(self, state, parent, action, g, f):
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.g = g
+        self.f = f
+        self.depth = 0
+        if parent != None:
+            self.depth = parent.depth + 1
+        self.children = []
+        # The f of each dropped child by state, and the smallest of them
+        self.forgotten = {}
+        self.forgottenF = None
+        self.version = 0
+
+    def getPath(self):
+        path = []
+        node = self
+        while node.parent != None:
+            path.append(node.action)
+            node = node.parent
+        path.reverse()
+        return path
+
+    def isOnPath(self, state):
+        "Returns True if state is this node's state or one of its ancestors'"
+        node = self
+        while node != None:
+            if node.state == state:
+                return True
+            node = node.parent
+        return False
+
+def smaStarSearch(problem, heuristic=nullHeuristic, maxNodes=10000):
+    """
+    Simplified memory-bounded A* (SMA*).  After each expansion the search
+    tree is cut back to maxNodes nodes: the leaf with the highest f (the
+    shallowest one on ties) is dropped and its parent remembers the smallest
+    f among its dropped children.  Such a parent stays on the open list with
+    that f and, if it ever looks best, regenerates the children it is
+    missing, each with at least the f it had when it was dropped, so what
+    was learned about a dropped subtree is not lost.  Internal nodes carry
+    the smallest f of their subtree.
+
+    A successor whose state is already in the tree with an equal or lower
+    g is not generated; the cheaper node stands for it.  A path of maxNodes
+    nodes fills the memory, so a node at depth maxNodes - 1 that is not a
+    goal can never lead to one and gets f = infinity.
+
+    Returns an optimal path whenever maxNodes is larger than the depth of
+    the shallowest optimal solution.  Once the best open f is infinite no
+    goal fits in memory (or none can be reached) and [] is returned.
+    """
+    infinity = float('inf')
+    start = problem.getStartState()
+    root = SMANode(start, None, None, 0, heuristic(start, problem))
+    openNodes = set()
+    heaps = {'best': [], 'worst': []}
+    counter = [0]
+
+    def addOpen(node):
+        # Leaves are open with their f; internal nodes with dropped children
+        # are open with the smallest dropped f.  Only leaves may be dropped.
+        node.version += 1
+        counter[0] += 1
+        openNodes.add(node)
+        if node.children:
+            heapq.heappush(heaps['best'], (node.forgottenF, -node.depth, counter[0], node.version, node))
+        else:
+            heapq.heappush(heaps['best'], (node.f, -node.depth, counter[0], node.version, node))
+            heapq.heappush(heaps['worst'], (-node.f, node.depth, counter[0], node.version, node))
+
+    def removeOpen(node):
+        node.version += 1
+        openNodes.discard(node)
+
+    def isCurrent(entry):
+        return entry[-2] == entry[-1].version and entry[-1] in openNodes
+
+    def compact():
+        # Both heaps use lazy deletion; rebuild them from the open nodes
+        # before stale entries can outgrow the memory bound.
+        nodes = list(openNodes)
+        openNodes.clear()
+        heaps['best'], heaps['worst'] = [], []
+        for node in nodes:
+            addOpen(node)
+
+    def backUp(node):
+        while node != None:
+            f = min([child.f for child in node.children] or [infinity])
+            if node.forgottenF != None:
+                f = min(f, node.forgottenF)
+            if f == node.f:
+                break
+            node.f = f
+            node = node.parent
+
+    # The cheapest live node of every state in the tree
+    inTree = {start: root}
+    addOpen(root)
+    used, pushes, maxUsed = 1, 1, 1
+    while openNodes:
+        if len(heaps['best']) > 2 * maxNodes:
+            compact()
+        entry = heapq.heappop(heaps['best'])
+        if not isCurrent(entry):
+            continue
+        if entry[0] == infinity:
+            break
+        node = entry[-1]
+        if not node.children and problem.isGoalState(node.state):
+            recordFrontierStats(problem, pushes, maxUsed)
+            return node.getPath()
+
+        removeOpen(node)
+        floor = node.f
+        if node.children:
+            floor = node.forgottenF
+        present = set([child.state for child in node.children])
+        forgotten = node.forgotten
+        node.forgotten = {}
+        node.forgottenF = None
+        for (newstate, action, newcost) in problem.getSuccessors(node.state):
+            if newstate in present or node.isOnPath(newstate):
+                continue
+            g = node.g + newcost
+            if newstate in inTree and inTree[newstate].g <= g:
+                continue
+            child = SMANode(newstate, node, action, g, max(floor, g + heuristic(newstate, problem)))
+            if newstate in forgotten:
+                child.f = max(child.f, forgotten[newstate])
+            if child.depth >= maxNodes - 1 and not problem.isGoalState(newstate):
+                child.f = infinity
+            inTree[newstate] = child
+            node.children.append(child)
+            addOpen(child)
+            used += 1
+            pushes += 1
+        if not node.children:
+            node.f = infinity
+            addOpen(node)
+            backUp(node.parent)
+            continue
+        backUp(node)
+
+        while used > maxNodes and heaps['worst']:
+            entry = heapq.heappop(heaps['worst'])
+            leaf = entry[-1]
+            if not isCurrent(entry) or leaf.children or leaf is root:
+                continue
+            removeOpen(leaf)
+            if inTree.get(leaf.state) is leaf:
+                del inTree[leaf.state]
+            parent = leaf.parent
+            parent.children.remove(leaf)
+            parent.forgotten[leaf.state] = leaf.f
+            if parent.forgottenF == None or leaf.f < parent.forgottenF:
+                parent.forgottenF = leaf.f
+            used -= 1
+            if not parent.children:
+                parent.f = parent.forgottenF
+            addOpen(parent)
+            backUp(parent)
+        maxUsed = max(maxUsed, used)
+
+    recordFrontierStats(problem, pushes, maxUsed)
+    return []
+
+def jumpPointSearch(problem, heuristic=nullHeuristic):
+    """
+    Jump point search for problems on a 4-connected grid of unit-cost moves
+    whose states are (x,y) positions and which expose their walls as
+    problem.walls (PositionSearchProblem, AnyFoodSearchProblem).
+
+    Among equally short paths it only considers those that move
+    horizontally before vertically wherever the grid allows it.  So after a
+    vertical step, turning sideways is only needed when the cell diagonally
+    behind is a wall (a forced neighbor).  Straight runs are jumped over
+    without being added to the frontier: a vertical jump stops at the goal
+    or at a cell with a forced neighbor, and a horizontal jump stops at the
+    goal or at a cell from which a vertical jump finds such a cell.  A* then
+    runs over the jump points only, keyed by position and the direction of
+    arrival, which yields a path as short as breadth first search.
+    """
+    from game import Directions
+    walls = problem.walls
+    isGoalState = problem.isGoalState
+    moves = {Directions.NORTH: (0, 1), Directions.SOUTH: (0, -1),
+             Directions.EAST: (1, 0), Directions.WEST: (-1, 0)}
+    horizontal = {1: Directions.EAST, -1: Directions.WEST}
+    vertical = {1: Directions.NORTH, -1: Directions.SOUTH}
+
+    def isForced(x, y, dx, dy):
+        # Stepping sideways by dx after moving vertically by dy is forced when
+        # the sideways cell is open but the cell beside the previous one is not
+        return not walls[x + dx][y] and walls[x + dx][y - dy]
+
+    def jumpVertical(x, y, dy):
+        steps = 0
+        while True:
+            y += dy
+            steps += 1
+            if walls[x][y]:
+                return None
+            if isGoalState((x, y)) or isForced(x, y, 1, dy) or isForced(x, y, -1, dy):
+                return (x, y), steps
+
+    def jumpHorizontal(x, y, dx):
+        steps = 0
+        while True:
+            x += dx
+            steps += 1
+            if walls[x][y]:
+                return None
+            if isGoalState((x, y)) or jumpVertical(x, y, 1) or jumpVertical(x, y, -1):
+                return (x, y), steps
+
+    def jump(position, direction):
+        dx, dy = moves[direction]
+        if dx:
+            return jumpHorizontal(position[0], position[1], dx)
+        return jumpVertical(position[0], position[1], dy)
+
+    def prunedDirections(position, arrival):
+        if arrival == None:
+            return moves.keys()
+        dx, dy = moves[arrival]
+        if dx:
+            return [arrival, Directions.NORTH, Directions.SOUTH]
+        x, y = position
+        return [arrival] + [horizontal[side] for side in (1, -1) if isForced(x, y, side, dy)]
+
+    start = (problem.getStartState(), None)
+    nodes = util.NodeStore()
+    frontier = util.IndexedPriorityQueue()
+    explored = set()
+    bestG = {start: 0}
+    bestNode = {start: nodes.add(util.NodeStore.ROOT, None)}
+    frontier.push(start, heuristic(start[0], problem))
+
+    while not frontier.isEmpty():
+        node = frontier.pop()
+        position, arrival = node
+        if isGoalState(position):
+            recordFrontierStats(problem, frontier.pushes, frontier.maxSize)
+            path = []
+            for direction, steps in nodes.getPath(bestNode[node]):
+                path.extend([direction] * steps)
+            return path
+        explored.add(node)
+        if '_expanded' in dir(problem):
+            problem._expanded += 1
+        cost = bestG[node]
+        for direction in prunedDirections(position, arrival):
+            found = jump(position, direction)
+            if found == None:
+                continue
+            newstate = (found[0], direction)
+            if newstate in explored:
+                continue
+            g = cost + found[1]
+            if newstate not in bestG or g < bestG[newstate]:
+                bestG[newstate] = g
+                bestNode[newstate] = nodes.add(bestNode[node], (direction, found[1]))
+                frontier.update(newstate, g + heuristic(found[0], problem))
+
+    recordFrontierStats(problem, frontier.pushes, frontier.maxSize)
+    return []
+
+class ReverseSearchProblem(SearchProblem):
+    """
+    The reverse of a search problem with a single known goal, problem.goal,
+    and reversible moves (such as PositionSearchProblem).  It starts at the
+    goal and ends at the forward start state; its successors are the forward
+    problem's predecessors, labelled with the action that moves from the
+    predecessor to the state.  Step costs are assumed to be symmetric, which
+    holds for unit-cost grid moves.
+
+    Any other attribute (walls, costFn, ...) is read from the forward problem,
+    so heuristics written for it also work on the reverse problem.
+    """
+    def __init__(self, problem):
+        from game import Directions
+        self.problem = problem
+        self.goal = problem.getStartState()
+        self.reverse = Directions.REVERSE
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def getStartState(self):
+        return self.problem.goal
+
+    def isGoalState(self, state):
+        return state == self.goal
+
+    def getSuccessors(self, state):
+        return [(prev, self.reverse[action], cost) for (prev, action, cost) in self.problem.getSuccessors(state)]
+
+def joinPaths(forwardNodes, forwardId, backwardNodes, backwardId):
+    "Joins the forward path to a meeting state with the backward path from it"
+    path = forwardNodes.getPath(forwardId)
+    backward = backwardNodes.getPath(backwardId)
+    backward.reverse()
+    return path + backward
+
+def bidirectionalSearch(problem):
+    """
+    Breadth first search from the start state and from problem.goal at the
+    same time, always growing the side with the smaller layer.  The first
+    state reached from both sides lies on a shortest path, provided moves
+    are reversible and every step costs 1.
+    """
+    problems = (problem, ReverseSearchProblem(problem))
+    nodes = (util.NodeStore(), util.NodeStore())
+    reached = ({}, {})
+    layers = [[], []]
+    for side in (0, 1):
+        start = problems[side].getStartState()
+        reached[side][start] = nodes[side].add(util.NodeStore.ROOT, None)
+        layers[side].append(start)
+    if problem.getStartState() == problem.goal:
+        return []
+
+    pushes, maxFrontier = 2, 2
+    while layers[0] and layers[1]:
+        side = 0
+        if len(layers[1]) < len(layers[0]):
+            side = 1
+        other = 1 - side
+        nextLayer = []
+        for node in layers[side]:
+            nodeId = reached[side][node]
+            for (newstate, action, newcost) in problems[side].getSuccessors(node):
+                if newstate in reached[side]:
+                    continue
+                newId = nodes[side].add(nodeId, action)
+                reached[side][newstate] = newId
+                if newstate in reached[other]:
+                    recordFrontierStats(problem, pushes + 1, maxFrontier)
+                    if side == 0:
+                        return joinPaths(nodes[0], newId, nodes[1], reached[1][newstate])
+                    return joinPaths(nodes[0], reached[0][newstate], nodes[1], newId)
+                nextLayer.append(newstate)
+        layers[side] = nextLayer
+        pushes += len(nextLayer)
+        maxFrontier = max(maxFrontier, len(layers[0]) + len(layers[1]))
+
+    recordFrontierStats(problem, pushes, maxFrontier)
+    return []
+
+def bidirectionalAStarSearch(problem, heuristic=nullHeuristic):
+    """
+    A* from the start state towards problem.goal and from problem.goal
+    towards the start state, growing the side with the smaller frontier.
+    The heuristic is called with a ReverseSearchProblem for the backward
+    side, so a heuristic that measures the distance to problem.goal (like
+    manhattanHeuristic) measures the distance to the start state there.
+
+    Whenever the two searches touch, the cheapest known start-to-goal path
+    is updated; the search stops once the smallest f value on either
+    frontier is no better than that path, which keeps the result optimal
+    for consistent heuristics.  Assumes reversible moves with symmetric
+    step costs.
+    """
+    problems = (problem, ReverseSearchProblem(problem))
+    nodes = (util.NodeStore(), util.NodeStore())
+    frontiers = (util.IndexedPriorityQueue(), util.IndexedPriorityQueue())
+    bestG = ({}, {})
+    nodeIds = ({}, {})
+    explored = (set(), set())
+    for side in (0, 1):
+        start = problems[side].getStartState()
+        bestG[side][start] = 0
+        nodeIds[side][start] = nodes[side].add(util.NodeStore.ROOT, None)
+        frontiers[side].push(start, heuristic(start, problems[side]))
+    if problem.getStartState() == problem.goal:
+        return []
+
+    bestCost, meet = None, None
+    while not frontiers[0].isEmpty() and not frontiers[1].isEmpty():
+        if bestCost != None and max(frontiers[0].getMinPriority(), frontiers[1].getMinPriority()) >= bestCost:
+            break
+        side = 0
+        if len(frontiers[1]) < len(frontiers[0]):
+            side = 1
+        other = 1 - side
+        node = frontiers[side].pop()
+        explored[side].add(node)
+        cost = bestG[side][node]
+        for (newstate, action, newcost) in problems[side].getSuccessors(node):
+            if newstate in explored[side]:
+                continue
+            g = cost + newcost
+            if newstate not in bestG[side] or g < bestG[side][newstate]:
+                bestG[side][newstate] = g
+                nodeIds[side][newstate] = nodes[side].add(nodeIds[side][node], action)
+                frontiers[side].update(newstate, g + heuristic(newstate, problems[side]))
+                if newstate in bestG[other]:
+                    total = g + bestG[other][newstate]
+                    if bestCost == None or total < bestCost:
+                        bestCost, meet = total, newstate
+
+    recordFrontierStats(problem, frontiers[0].pushes + frontiers[1].pushes,
+                        frontiers[0].maxSize + frontiers[1].maxSize)
+    if meet == None:
+        return []
+    return joinPaths(nodes[0], nodeIds[0][meet], nodes[1], nodeIds[1][meet])
+
 
 # Abbreviations
 bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+ucsdk = uniformCostSearchDecreaseKey
+astardk = aStarSearchDecreaseKey
+bidi = bidirectionalSearch
+bidiastar = bidirectionalAStarSearch
+idastar = idaStarSearch
+smastar = smaStarSearch
+jps = jumpPointSearch
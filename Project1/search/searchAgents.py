@@ -38,10 +38,12 @@ Good luck and happy searching!
 from game import Directions
 from game import Agent
 from game import Actions
+from game import Bitboard
 from math import *
 import util
 import time
 import search
+import distanceTable
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
@@ -69,20 +71,33 @@ class SearchAgent(Agent):
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
 
+    Passing cacheHeuristic=True memoizes the heuristic by state (see
+    search.CachedHeuristic); cacheSize bounds the number of cached values.
+    maxNodes sets the memory bound of search functions that take one, such
+    as smaStarSearch.
+
 
     Note: You should NOT change any code in SearchAgent
     """
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic',
+                 cacheHeuristic=False, cacheSize=100000, maxNodes=None):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
 
         # Get the search function from the name and heuristic
         if fn not in dir(search):
             raise AttributeError, fn + ' is not a search function in search.py.'
         func = getattr(search, fn)
+        self.heuristicCache = None
+        searchArgs = {}
+        if maxNodes != None:
+            if 'maxNodes' not in func.func_code.co_varnames:
+                raise AttributeError, fn + ' does not take a maxNodes bound.'
+            searchArgs['maxNodes'] = int(maxNodes)
+            print('[SearchAgent] limiting search to %d nodes' % int(maxNodes))
         if 'heuristic' not in func.func_code.co_varnames:
             print('[SearchAgent] using function ' + fn)
-            self.searchFunction = func
+            self.searchFunction = lambda x: func(x, **searchArgs)
         else:
             if heuristic in globals().keys():
                 heur = globals()[heuristic]
@@ -91,8 +106,11 @@ class SearchAgent(Agent):
             else:
                 raise AttributeError, heuristic + ' is not a function in searchAgents.py or search.py.'
             print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
+            if str(cacheHeuristic) == 'True':
+                heur = self.heuristicCache = search.CachedHeuristic(heur, int(cacheSize))
+                print('[SearchAgent] caching up to %d heuristic values' % int(cacheSize))
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            self.searchFunction = lambda x: func(x, heuristic=heur, **searchArgs)
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
@@ -115,6 +133,11 @@ class SearchAgent(Agent):
         totalCost = problem.getCostOfActions(self.actions)
         print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
         if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        if '_frontierPushes' in dir(problem):
+            print('Frontier pushes: %d, peak frontier size: %d' % (problem._frontierPushes, problem._maxFrontier))
+        if getattr(self, 'heuristicCache', None) != None:
+            cache = self.heuristicCache
+            print('Heuristic cache: %d hits, %d misses' % (cache.hits, cache.misses))
 
     def getAction(self, state):
         """
@@ -383,12 +406,13 @@ class FoodSearchProblem:
     A search problem associated with finding the a path that collects all of the
     food (dots) in a Pacman game.
 
-    A search state in this problem is a tuple ( pacmanPosition, foodGrid ) where
+    A search state in this problem is a tuple ( pacmanPosition, food ) where
       pacmanPosition: a tuple (x,y) of integers specifying Pacman's position
-      foodGrid:       a Grid (see game.py) of either True or False, specifying remaining food
+      food:           a Bitboard (see game.py) of the remaining food, which
+                      reads like a Grid: food[x][y], food.asList(), food.count()
     """
     def __init__(self, startingGameState):
-        self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
+        self.start = (startingGameState.getPacmanPosition(), Bitboard.fromGrid(startingGameState.getFood()))
         self.walls = startingGameState.getWalls()
         self.startingGameState = startingGameState
         self._expanded = 0
@@ -409,8 +433,7 @@ class FoodSearchProblem:
             dx, dy = Actions.directionToVector(direction)
             nextx, nexty = int(x + dx), int(y + dy)
             if not self.walls[nextx][nexty]:
-                nextFood = state[1].copy()
-                nextFood[nextx][nexty] = False
+                nextFood = state[1].remove(nextx, nexty)
                 successors.append( ( ((nextx, nexty), nextFood), direction, 1) )
         return successors
 
@@ -447,8 +470,10 @@ def foodHeuristic(state, problem):
     inadmissible or inconsistent heuristics may find optimal solutions, so be careful.
 
     The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a
-    Grid (see game.py) of either True or False. You can call foodGrid.asList()
-    to get a list of food coordinates instead.
+    Bitboard (see game.py) of the remaining food.  It reads like a Grid: call
+    foodGrid.asList() to get a list of food coordinates, or test a single cell
+    with foodGrid[x][y].  It cannot be changed; foodGrid.copy() returns a Grid
+    that can.
 
     If you want access to info like walls, capsules, etc., you can query the problem.
     For example, problem.walls gives you a Grid of where the walls are.
@@ -462,43 +487,53 @@ def foodHeuristic(state, problem):
     return mstFoodHeuristicSolver(state, problem)
 
 
+def getMazeDistances(problem):
+    "Returns the shared distanceTable.DistanceTable for the problem's walls"
+    if 'distanceTable' not in problem.heuristicInfo:
+        problem.heuristicInfo['distanceTable'] = distanceTable.getDistanceTable(problem.walls)
+    return problem.heuristicInfo['distanceTable']
+
 def mstFoodHeuristicSolver(state, problem):
     # Heuristic that constructs a MST to model the relaxed problem of going to the nearest
-    # food and finding a minimal straight line path (tree) to all food.
-
-    position, foodGrid = state
-    foodList = set(foodGrid.asList())
-    wallList = problem.walls.asList()
-
-    def intelliDist(x, y, wallList):
-        distance = util.manhattanDistance(x, y)
-        if x[0] == y[0] or x[1] == y[1]:
-            for wall in wallList:
-                if x[1] == y[1] and wall[1] == x[1] and min(x[0], y[0]) < wall[0] < max(x[0], y[0]):
-                    return distance + 2
-                elif x[0] == y[0] and wall[0] == x[0] and min(x[1], y[1]) < wall[1] < max(x[1], y[1]):
-                    return distance + 2
-        return distance
-
-    if len(foodList) < 1:
+    # food and finding a minimal path (tree) through all food, using exact maze distances.
+    # The same food subsets show up in many A* states, so MST weights are memoized by
+    # the remaining food's bitmask in problem.heuristicInfo['mstWeights'].
+
+    position, food = state
+    if food.count() < 1:
         return 0
 
-    distToAllFoodsFromPacman = [(util.manhattanDistance(position, food), food) for food in foodList]
-    pacmanDistanceFactor = min(distToAllFoodsFromPacman)
-    farthest = max(distToAllFoodsFromPacman)[1]
-    mstDistanceFactor = mstSolverPrim(foodList, wallList, pacmanDistanceFactor[1], intelliDist)
-    return pacmanDistanceFactor[0] + mstDistanceFactor
+    distances = getMazeDistances(problem)
+    foodIds = [distances.getCellId(pos) for pos in food.asList()]
+    mstWeights = problem.heuristicInfo.setdefault('mstWeights', {})
+    if food.bits not in mstWeights:
+        mstWeights[food.bits] = mstSolverPrim(foodIds, distances)
 
+    pacmanId = distances.getCellId(position)
+    pacmanDistanceFactor = min([distances.getDistanceById(pacmanId, foodId) for foodId in foodIds])
+    return pacmanDistanceFactor + mstWeights[food.bits]
 
-def mstSolverPrim(foodList, wallList, start, dist):
-    # implementation of prim's algo, basically O(V^2) since foodList is generally short
-    frontier = set([start])
+
+def mstSolverPrim(cellIds, distances):
+    # prim's algo over the rows of the distance table, O(V^2) with no sorting:
+    # best[i] holds the cheapest edge from the tree to cellIds[i]
+    numCells, table = distances.numCells, distances.distances
+    rest = list(cellIds[1:])
+    row = cellIds[0] * numCells
+    best = [table[row + cell] for cell in rest]
     mstDistance = 0
-    while len(frontier) != len(foodList):
-        minsearchset = [(x, k) for x in frontier for k in foodList if k not in frontier]
-        edge = sorted(set(minsearchset), key=lambda x: dist(x[0], x[1], wallList))[0]
-        frontier.add(edge[1])
-        mstDistance += dist(edge[0], edge[1], wallList)
+    while rest:
+        i = best.index(min(best))
+        mstDistance += best[i]
+        cell = rest[i]
+        rest[i], best[i] = rest[-1], best[-1]
+        rest.pop()
+        best.pop()
+        row = cell * numCells
+        for j in range(len(rest)):
+            d = table[row + rest[j]]
+            if d < best[j]:
+                best[j] = d
     return mstDistance
 
 
@@ -587,9 +622,12 @@ class ApproximateSearchAgent(Agent):
 
 def mazeDistance(point1, point2, gameState):
     """
-    Returns the maze distance between any two points, using the search functions
-    you have already built.  The gameState can be any game state -- Pacman's position
-    in that state is ignored.
+    Returns the maze distance between any two points, looked up in the
+    layout's precomputed distance table (see distanceTable.py).  The gameState
+    can be any game state -- Pacman's position in that state is ignored.
+
+    If no path connects the two points this returns 0, the length of the empty
+    path breadth first search returns in that case.
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
@@ -598,7 +636,9 @@ def mazeDistance(point1, point2, gameState):
     x1, y1 = point1
     x2, y2 = point2
     walls = gameState.getWalls()
-    assert not walls[x1][y1], 'point1 is a wall: ' + point1
+    assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    distance = distanceTable.getDistanceTable(walls).getDistance(point1, point2)
+    if distance == distanceTable.UNREACHABLE:
+        return 0
+    return distance
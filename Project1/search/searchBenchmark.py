@@ -0,0 +1,305 @@
+# searchBenchmark.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Headless benchmark of the search functions in search.py.
+
+For every layout in layouts/, every search problem that fits the layout,
+every search function in search.py and every heuristic that works on the
+problem, this records wall time, nodes expanded, frontier pushes, peak
+frontier size, peak resident memory and path cost.  Each run happens in a
+child process so it gets its own memory measurement and can be stopped
+after a timeout.
+
+Examples:
+> python searchBenchmark.py --json baseline.json
+> python searchBenchmark.py -l bigMaze,trickySearch -f astar,astardk --baseline baseline.json
+"""
+
+import optparse
+import os
+import sys
+import time
+import json
+import csv
+import multiprocessing
+import resource
+import Queue
+
+import layout
+import pacman
+import search
+import searchAgents
+import util
+
+FIELDS = ['layout', 'problem', 'function', 'heuristic', 'status', 'time', 'expanded',
+          'pushes', 'maxFrontier', 'maxRSS', 'cost']
+
+# Search functions that only make sense for problems with a single goal
+# position (problem.goal) or with (x,y) states on a grid.
+GOAL_FUNCTIONS = ['bidirectionalSearch', 'bidirectionalAStarSearch']
+GRID_FUNCTIONS = ['jumpPointSearch']
+
+def getSearchFunctions():
+    "Returns the names of the search functions defined in search.py"
+    names = []
+    for name in dir(search):
+        obj = getattr(search, name)
+        if not callable(obj) or not hasattr(obj, 'func_code') or obj.__name__ != name:
+            continue
+        if name.startswith('general') or name == 'tinyMazeSearch':
+            continue
+        # search functions take a problem and nothing else without a default
+        code = obj.func_code
+        if code.co_varnames[:1] != ('problem',) or code.co_argcount - len(obj.func_defaults or ()) != 1:
+            continue
+        names.append(name)
+    return names
+
+def getHeuristics():
+    "Returns the names of the heuristics defined in searchAgents.py and search.py"
+    names = set()
+    for module in [search, searchAgents]:
+        for name in dir(module):
+            if name.endswith('Heuristic') and hasattr(getattr(module, name), 'func_code'):
+                names.add(name)
+    return sorted(names)
+
+def lookupHeuristic(name):
+    if hasattr(searchAgents, name):
+        return getattr(searchAgents, name)
+    return getattr(search, name)
+
+def getLayoutNames():
+    return sorted([f[:-4] for f in os.listdir('layouts') if f.endswith('.lay')])
+
+def makeGameState(layoutName):
+    gameState = pacman.GameState()
+    gameState.initialize(layout.getLayout(layoutName), 0)
+    return gameState
+
+def getProblems(layoutName, gameState):
+    """
+    Returns (name, factory) pairs for the search problems that fit a layout:
+    corner problems for the *Corners layouts, a position problem towards the
+    single dot of a maze, and both food problems otherwise.
+    """
+    if 'Corners' in layoutName:
+        return [('CornersProblem', searchAgents.CornersProblem)]
+    food = gameState.getFood().asList()
+    if len(food) == 1:
+        goal = food[0]
+        return [('PositionSearchProblem',
+                 lambda state: searchAgents.PositionSearchProblem(state, goal=goal, warn=False, visualize=False))]
+    if len(food) == 0:
+        return []
+    return [('FoodSearchProblem', searchAgents.FoodSearchProblem),
+            ('AnyFoodSearchProblem', searchAgents.AnyFoodSearchProblem)]
+
+def fitsProblem(functionName, problem):
+    if functionName in GOAL_FUNCTIONS and 'goal' not in dir(problem):
+        return False
+    if functionName in GRID_FUNCTIONS:
+        start = problem.getStartState()
+        if type(start) != tuple or len(start) != 2 or type(start[0]) != int:
+            return False
+    return True
+
+def fitsHeuristic(heuristic, problem):
+    "A heuristic fits a problem if it returns a number for the start state"
+    try:
+        util.mutePrint()
+        try:
+            value = heuristic(problem.getStartState(), problem)
+        finally:
+            util.unmutePrint()
+        return isinstance(value, (int, long, float))
+    except Exception:
+        return False
+
+def runOne(layoutName, problemFactory, functionName, heuristicName, results):
+    "Runs a single search in a child process and puts its row on results"
+    gameState = makeGameState(layoutName)
+    util.mutePrint()
+    try:
+        problem = problemFactory(gameState)
+        func = getattr(search, functionName)
+        if heuristicName != None:
+            heuristic = lookupHeuristic(heuristicName)
+            searchFunction = lambda problem: func(problem, heuristic=heuristic)
+        else:
+            searchFunction = func
+        startTime = time.time()
+        path = searchFunction(problem)
+        elapsed = time.time() - startTime
+        cost = problem.getCostOfActions(path)
+    finally:
+        util.unmutePrint()
+    status = 'ok'
+    if cost >= 999999 or (path == [] and not problem.isGoalState(problem.getStartState())):
+        status = 'nopath'
+    results.put({'status': status,
+                 'time': round(elapsed, 4),
+                 'expanded': getattr(problem, '_expanded', None),
+                 'pushes': getattr(problem, '_frontierPushes', None),
+                 'maxFrontier': getattr(problem, '_maxFrontier', None),
+                 'maxRSS': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 'cost': cost})
+
+def runChild(layoutName, problemFactory, functionName, heuristicName, results):
+    try:
+        runOne(layoutName, problemFactory, functionName, heuristicName, results)
+    except Exception, e:
+        results.put({'status': 'error: %s' % e})
+
+def benchmark(layoutName, problemName, problemFactory, functionName, heuristicName, timeout):
+    row = dict((field, None) for field in FIELDS)
+    row.update({'layout': layoutName, 'problem': problemName, 'function': functionName,
+                'heuristic': heuristicName or '-'})
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=runChild,
+                                    args=(layoutName, problemFactory, functionName, heuristicName, results))
+    child.start()
+    child.join(timeout)
+    if child.is_alive():
+        child.terminate()
+        child.join()
+        row['status'] = 'timeout'
+        row['time'] = timeout
+    else:
+        try:
+            row.update(results.get(timeout=1))
+        except Queue.Empty:
+            row['status'] = 'crashed'
+    return row
+
+def runBenchmarks(options):
+    layoutNames = options.layouts and options.layouts.split(',') or getLayoutNames()
+    functionNames = options.functions and options.functions.split(',') or getSearchFunctions()
+    functionNames = [getattr(search, name).__name__ for name in functionNames]
+    heuristicNames = options.heuristics and options.heuristics.split(',') or getHeuristics()
+
+    rows = []
+    for layoutName in layoutNames:
+        gameState = makeGameState(layoutName)
+        for problemName, problemFactory in getProblems(layoutName, gameState):
+            util.mutePrint()
+            try:
+                problem = problemFactory(gameState)
+            finally:
+                util.unmutePrint()
+            heuristics = [name for name in heuristicNames if fitsHeuristic(lookupHeuristic(name), problem)]
+            for functionName in functionNames:
+                if not fitsProblem(functionName, problem):
+                    continue
+                if 'heuristic' in getattr(search, functionName).func_code.co_varnames:
+                    runs = heuristics
+                else:
+                    runs = [None]
+                for heuristicName in runs:
+                    row = benchmark(layoutName, problemName, problemFactory, functionName,
+                                    heuristicName, options.timeout)
+                    print '%-18s %-22s %-28s %-20s %-8s %8s s  expanded %s' % (
+                        row['layout'], row['problem'], row['function'], row['heuristic'],
+                        row['status'][:8], row['time'], row['expanded'])
+                    sys.stdout.flush()
+                    rows.append(row)
+    return rows
+
+def writeCSV(rows, path):
+    f = open(path, 'wb')
+    try:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writerow(dict((field, field) for field in FIELDS))
+        writer.writerows(rows)
+    finally:
+        f.close()
+
+def writeJSON(rows, path):
+    f = open(path, 'w')
+    try:
+        json.dump(rows, f, indent=1, sort_keys=True)
+    finally:
+        f.close()
+
+def rowKey(row):
+    return (row['layout'], row['problem'], row['function'], row['heuristic'])
+
+def compareToBaseline(rows, baselinePath, tolerance):
+    """
+    Prints every run that got worse than the saved baseline: a run that used
+    to succeed and no longer does, a different path cost, more nodes
+    expanded, or a wall time more than tolerance slower (ignoring differences
+    under 50ms).  Returns the number of regressions.
+    """
+    f = open(baselinePath)
+    try:
+        baseline = dict((rowKey(row), row) for row in json.load(f))
+    finally:
+        f.close()
+
+    regressions = 0
+    for row in rows:
+        key = rowKey(row)
+        if key not in baseline:
+            continue
+        old = baseline[key]
+        problems = []
+        if old['status'] == 'ok' and row['status'] != 'ok':
+            problems.append('status %s -> %s' % (old['status'], row['status']))
+        elif old['status'] == 'ok':
+            if row['cost'] != old['cost']:
+                problems.append('cost %s -> %s' % (old['cost'], row['cost']))
+            if old['expanded'] != None and row['expanded'] > old['expanded']:
+                problems.append('expanded %s -> %s' % (old['expanded'], row['expanded']))
+            if row['time'] > old['time'] * (1 + tolerance) and row['time'] - old['time'] > 0.05:
+                problems.append('time %.3fs -> %.3fs' % (old['time'], row['time']))
+        if problems:
+            regressions += 1
+            print 'REGRESSION %s: %s' % (' '.join([str(k) for k in key]), ', '.join(problems))
+    print '%d regressions against %s' % (regressions, baselinePath)
+    return regressions
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Benchmark the search functions in search.py')
+    parser.add_option('-l', '--layouts', dest = 'layouts', default = None,
+                      help = 'comma separated layouts to run (default: all of layouts/)')
+    parser.add_option('-f', '--functions', dest = 'functions', default = None,
+                      help = 'comma separated search functions to run (default: all)')
+    parser.add_option('-H', '--heuristics', dest = 'heuristics', default = None,
+                      help = 'comma separated heuristics to try (default: all)')
+    parser.add_option('-t', '--timeout', dest = 'timeout', type = 'float', default = 30,
+                      help = 'seconds before a single run is stopped (default %default)')
+    parser.add_option('--csv', dest = 'csvPath', default = None,
+                      help = 'write the results to this CSV file')
+    parser.add_option('--json', dest = 'jsonPath', default = None,
+                      help = 'write the results to this JSON file (usable as a baseline)')
+    parser.add_option('--baseline', dest = 'baselinePath', default = None,
+                      help = 'JSON results of an earlier run to compare against')
+    parser.add_option('--tolerance', dest = 'tolerance', type = 'float', default = 0.25,
+                      help = 'allowed relative slowdown before a run counts as a regression (default %default)')
+    (options, args) = parser.parse_args(argv)
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    rows = runBenchmarks(options)
+    if options.csvPath:
+        writeCSV(rows, options.csvPath)
+    if options.jsonPath:
+        writeJSON(rows, options.jsonPath)
+    if options.baselinePath:
+        if compareToBaseline(rows, options.baselinePath, options.tolerance) > 0:
+            sys.exit(1)
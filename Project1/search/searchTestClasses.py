@@ -174,16 +174,21 @@ class GraphSearchTest(testClasses.TestCase):
             self.heuristic = parseHeuristic(testDict['heuristic']) 
         else:
             self.heuristic = None
+        # The memory bound of searches such as smaStarSearch
+        self.maxNodes = testDict.get('maxNodes')
 
     # Note that the return type of this function is a tripple:
     # (solution, expanded states, error message)
     def getSolInfo(self, search):
         alg = getattr(search, self.alg)
         problem = GraphSearch(self.graph_text)
+        args = {}
+        if self.maxNodes != None:
+            args['maxNodes'] = int(self.maxNodes)
         if self.heuristic != None:
-            solution = alg(problem, self.heuristic)
+            solution = alg(problem, self.heuristic, **args)
         else:
-            solution = alg(problem)
+            solution = alg(problem, **args)
 
         if type(solution) != type([]):
             return None, None, 'The result of %s must be a list. (Instead, it is %s)' % (self.alg, type(solution))
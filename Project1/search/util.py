@@ -16,6 +16,7 @@
 import sys
 import inspect
 import heapq, random
+import array
 import cStringIO
 
 
@@ -135,6 +136,9 @@ class Stack:
         "Returns true if the stack is empty"
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
@@ -155,6 +159,9 @@ class Queue:
         "Returns true if the queue is empty"
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
 class PriorityQueue:
     """
       Implements a priority queue data structure. Each inserted item
@@ -186,6 +193,9 @@ class PriorityQueue:
     def isEmpty(self):
         return len(self.heap) == 0
 
+    def __len__(self):
+        return len(self.heap)
+
 class PriorityQueueWithFunction(PriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
@@ -202,6 +212,147 @@ class PriorityQueueWithFunction(PriorityQueue):
         "Adds an item to the queue with priority from the priority function"
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
+class IndexedPriorityQueue:
+    """
+      A binary-heap priority queue that holds at most one entry per item and
+      supports decrease-key.  The position of every item in the heap is kept
+      in an index, so update() can move an existing entry instead of pushing
+      a duplicate.  Ties are broken in insertion order, like PriorityQueue.
+
+      pushes counts the entries that were inserted or re-prioritized, and
+      maxSize records the largest number of entries held at once.
+    """
+    def __init__(self):
+        self.heap = []
+        self.index = {}
+        self.count = 0
+        self.pushes = 0
+        self.maxSize = 0
+
+    def push(self, item, priority):
+        "Inserts 'item', which must not already be in the queue"
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.pushes += 1
+        self.heap.append(entry)
+        self.index[item] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+        if len(self.heap) > self.maxSize:
+            self.maxSize = len(self.heap)
+
+    def update(self, item, priority):
+        """
+          Inserts 'item' if it is not in the queue, otherwise lowers its
+          priority if 'priority' is smaller.  Returns True if the queue changed.
+        """
+        if item not in self.index:
+            self.push(item, priority)
+            return True
+        i = self.index[item]
+        entry = self.heap[i]
+        if entry[0] <= priority:
+            return False
+        entry[0] = priority
+        entry[1] = self.count
+        self.count += 1
+        self.pushes += 1
+        self._siftUp(i)
+        return True
+
+    def pop(self):
+        last = self.heap.pop()
+        if self.heap:
+            entry = self.heap[0]
+            self.heap[0] = last
+            self.index[last[2]] = 0
+            self._siftDown(0)
+        else:
+            entry = last
+        del self.index[entry[2]]
+        return entry[2]
+
+    def getPriority(self, item):
+        return self.heap[self.index[item]][0]
+
+    def getMinPriority(self):
+        "Returns the lowest priority in the queue without removing its item"
+        return self.heap[0][0]
+
+    def isEmpty(self):
+        return len(self.heap) == 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def _siftUp(self, i):
+        heap, index = self.heap, self.index
+        entry = heap[i]
+        key = entry[:2]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if key < heap[parent][:2]:
+                heap[i] = heap[parent]
+                index[heap[i][2]] = i
+                i = parent
+            else:
+                break
+        heap[i] = entry
+        index[entry[2]] = i
+
+    def _siftDown(self, i):
+        heap, index = self.heap, self.index
+        size = len(heap)
+        entry = heap[i]
+        key = entry[:2]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][:2] < heap[child][:2]:
+                child += 1
+            if heap[child][:2] < key:
+                heap[i] = heap[child]
+                index[heap[i][2]] = i
+                i = child
+            else:
+                break
+        heap[i] = entry
+        index[entry[2]] = i
+
+class NodeStore:
+    """
+      An array-backed store of search nodes.  Every node is identified by an
+      integer id and records only the id of its parent and the action that
+      led to it, so a frontier can hold node ids instead of whole action
+      lists.  The path to a node is rebuilt by following parent pointers.
+    """
+    ROOT = -1
+
+    def __init__(self):
+        self.parents = array.array('l')
+        self.actions = []
+
+    def add(self, parent, action):
+        "Adds a node reached from node 'parent' by 'action' and returns its id"
+        self.parents.append(parent)
+        self.actions.append(action)
+        return len(self.actions) - 1
+
+    def getPath(self, node):
+        "Returns the list of actions leading from the root to 'node'"
+        path = []
+        while self.parents[node] != NodeStore.ROOT:
+            path.append(self.actions[node])
+            node = self.parents[node]
+        path.reverse()
+        return path
+
+    def __len__(self):
+        return len(self.actions)
+
 
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
@@ -39,11 +39,12 @@ SONAR_MAX = (SONAR_NOISE_RANGE - 1)/2
 SONAR_NOISE_VALUES = [i - SONAR_MAX for i in range(SONAR_NOISE_RANGE)]
 SONAR_DENOMINATOR = 2 ** SONAR_MAX  + 2 ** (SONAR_MAX + 1) - 2.0
 SONAR_NOISE_PROBS = [2 ** (SONAR_MAX-abs(v)) / SONAR_DENOMINATOR  for v in SONAR_NOISE_VALUES]
+SONAR_NOISE_SAMPLER = util.Sampler(SONAR_NOISE_PROBS, SONAR_NOISE_VALUES)
 
 def getNoisyDistance(pos1, pos2):
     if pos2[1] == 1: return None
     distance = util.manhattanDistance(pos1, pos2)
-    return max(0, distance + util.sample(SONAR_NOISE_PROBS, SONAR_NOISE_VALUES))
+    return max(0, distance + SONAR_NOISE_SAMPLER.sample())
 
 observationDistributions = {}
 def getObservationDistribution(noisyDistance):
@@ -259,7 +260,7 @@ class GameState:
         """
         Allows states to be keys of dictionaries.
         """
-        return hash( str( self ) )
+        return hash( self.data )
 
     def __str__( self ):
 
@@ -18,6 +18,7 @@ from game import Agent
 from game import Directions
 from keyboardAgents import KeyboardAgent
 import inference
+import inferenceWorkers
 import busters
 
 class NullGraphics:
@@ -58,20 +59,32 @@ class KeyboardInference(inference.InferenceModule):
 
 
 class BustersAgent:
-    "An agent that tracks and displays its beliefs about ghost positions."
+    """
+    An agent that tracks and displays its beliefs about ghost positions.
+
+    With numWorkers > 1 the inference modules are run in that many child
+    processes (see inferenceWorkers.py), e.g. -a numWorkers=4.
+    """
 
-    def __init__( self, index = 0, inference = "ExactInference", ghostAgents = None, observeEnable = True, elapseTimeEnable = True):
+    def __init__( self, index = 0, inference = "ExactInference", ghostAgents = None, observeEnable = True, elapseTimeEnable = True, numWorkers = 0):
         inferenceType = util.lookup(inference, globals())
         self.inferenceModules = [inferenceType(a) for a in ghostAgents]
         self.observeEnable = observeEnable
         self.elapseTimeEnable = elapseTimeEnable
+        self.numWorkers = int(numWorkers)
+        self.workerPool = None
 
     def registerInitialState(self, gameState):
         "Initializes beliefs and inference modules"
         import __main__
         self.display = __main__._display
-        for inference in self.inferenceModules: inference.initialize(gameState)
-        self.ghostBeliefs = [inf.getBeliefDistribution() for inf in self.inferenceModules]
+        if self.numWorkers > 1:
+            if self.workerPool == None:
+                self.workerPool = inferenceWorkers.InferenceWorkerPool(self.inferenceModules, self.numWorkers)
+            self.ghostBeliefs = self.workerPool.initialize(gameState)
+        else:
+            for inference in self.inferenceModules: inference.initialize(gameState)
+            self.ghostBeliefs = [inf.getBeliefDistribution() for inf in self.inferenceModules]
         self.firstMove = True
 
     def observationFunction(self, gameState):
@@ -82,16 +95,26 @@ class BustersAgent:
 
     def getAction(self, gameState):
         "Updates beliefs, then chooses an action based on updated beliefs."
-        for index, inf in enumerate(self.inferenceModules):
-            if not self.firstMove and self.elapseTimeEnable: 
-                inf.elapseTime(gameState)
+        if self.workerPool != None:
+            elapse = not self.firstMove and self.elapseTimeEnable
+            self.ghostBeliefs = self.workerPool.update(gameState, elapse, self.observeEnable)
             self.firstMove = False
-            if self.observeEnable:
-                inf.observeState(gameState)
-            self.ghostBeliefs[index] = inf.getBeliefDistribution()
+        else:
+            for index, inf in enumerate(self.inferenceModules):
+                if not self.firstMove and self.elapseTimeEnable: 
+                    inf.elapseTime(gameState)
+                self.firstMove = False
+                if self.observeEnable:
+                    inf.observeState(gameState)
+                self.ghostBeliefs[index] = inf.getBeliefDistribution()
         self.display.updateDistributions(self.ghostBeliefs)
         return self.chooseAction(gameState)
 
+    def final(self, gameState):
+        "Stops the inference workers at the end of a game."
+        if self.workerPool != None:
+            self.workerPool.close()
+
     def chooseAction(self, gameState):
         "By default, a BustersAgent just stops.  This should be overridden."
         return Directions.STOP
@@ -99,9 +122,9 @@ class BustersAgent:
 class BustersKeyboardAgent(BustersAgent, KeyboardAgent):
     "An agent controlled by the keyboard that displays beliefs about ghost positions."
 
-    def __init__(self, index = 0, inference = "KeyboardInference", ghostAgents = None):
+    def __init__(self, index = 0, inference = "KeyboardInference", ghostAgents = None, numWorkers = 0):
         KeyboardAgent.__init__(self, index)
-        BustersAgent.__init__(self, index, inference, ghostAgents)
+        BustersAgent.__init__(self, index, inference, ghostAgents, numWorkers = numWorkers)
 
     def getAction(self, gameState):
         return BustersAgent.getAction(self, gameState)
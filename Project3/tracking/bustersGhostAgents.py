@@ -20,6 +20,8 @@ from util import manhattanDistance
 import util
 
 class StationaryGhost( ghostAgents.GhostAgent ):
+    stationaryTransitions = True
+
     def getDistribution( self, state ):
         dist = util.Counter()
         dist[Directions.STOP] = 1.0
@@ -21,6 +21,10 @@ from util import manhattanDistance
 import util
 
 class GhostAgent( Agent ):
+    # True when getDistribution only depends on the ghost's own position and the
+    # walls, so inference can compile the transition model once per layout.
+    stationaryTransitions = False
+
     def __init__( self, index ):
         self.index = index
 
@@ -37,6 +41,8 @@ class GhostAgent( Agent ):
 
 class RandomGhost( GhostAgent ):
     "A ghost that chooses a legal action uniformly at random."
+    stationaryTransitions = True
+
     def getDistribution( self, state ):
         dist = util.Counter()
         for a in state.getLegalActions( self.index ): dist[a] = 1.0
@@ -50,6 +56,10 @@ class DirectionalGhost( GhostAgent ):
         self.prob_attack = prob_attack
         self.prob_scaredFlee = prob_scaredFlee
 
+    def getTransitionKey( self, state ):
+        "Besides the walls, the unscared getDistribution only depends on Pacman's position"
+        return ( self.prob_attack, self.prob_scaredFlee, state.getPacmanPosition() )
+
     def getDistribution( self, state ):
         # Read variables from state
         ghostState = state.getGhostState( self.index )
@@ -201,6 +201,8 @@ class PacmanGraphics:
                                 filled = 1, behind=2)
                 distx.append(block)
         self.distributionImages = dist
+        self.distributionColors = [[BACKGROUND_COLOR] * walls.height for x in range(walls.width)]
+        self.coloredCells = []
 
     def drawStaticObjects(self, state):
         layout = self.layout
@@ -588,25 +590,36 @@ class PacmanGraphics:
 
 
     def updateDistributions(self, distributions):
-        "Draws an agent's belief distributions"
-        # copy all distributions so we don't change their state
-        distributions = map(lambda x: x.copy(), distributions)
+        """
+        Draws an agent's belief distributions.  Only cells with belief now or
+        at the last update are visited, and only those whose color changed
+        are redrawn.
+        """
         if self.distributionImages == None:
             self.drawDistributions(self.previousState)
-        for x in range(len(self.distributionImages)):
-            for y in range(len(self.distributionImages[0])):
-                image = self.distributionImages[x][y]
-                weights = [dist[ (x,y) ] for dist in distributions]
-
-                if sum(weights) != 0:
-                    pass
-                # Fog of war
-                color = [0.0,0.0,0.0]
-                colors = GHOST_VEC_COLORS[1:] # With Pacman
-                if self.capture: colors = GHOST_VEC_COLORS
-                for weight, gcolor in zip(weights, colors):
-                    color = [min(1.0, c + 0.95 * g * weight ** .3) for c,g in zip(color, gcolor)]
-                changeColor(image, formatColor(*color))
+        width, height = len(self.distributionImages), len(self.distributionImages[0])
+        cells = set(self.coloredCells)
+        for dist in distributions:
+            for (x, y), weight in dist.items():
+                if weight != 0: cells.add((int(x), int(y)))
+
+        colors = GHOST_VEC_COLORS[1:] # With Pacman
+        if self.capture: colors = GHOST_VEC_COLORS
+        self.coloredCells = []
+        for x, y in cells:
+            if x < 0 or x >= width or y < 0 or y >= height: continue
+            # dist.get leaves the Counters unchanged, unlike dist[(x,y)]
+            weights = [dist.get((x, y), 0) for dist in distributions]
+            # Fog of war
+            color = [0.0,0.0,0.0]
+            for weight, gcolor in zip(weights, colors):
+                color = [min(1.0, c + 0.95 * g * weight ** .3) for c,g in zip(color, gcolor)]
+            color = formatColor(*color)
+            if color != self.distributionColors[x][y]:
+                changeColor(self.distributionImages[x][y], color)
+                self.distributionColors[x][y] = color
+            if color != BACKGROUND_COLOR:
+                self.coloredCells.append((x, y))
         refresh()
 
 class FirstPersonPacmanGraphics(PacmanGraphics):
@@ -18,8 +18,11 @@ import util
 import random
 import busters
 import game
+import array
+import math
+from collections import OrderedDict
 
-class InferenceModule:
+class InferenceModule(object):
     """
     An inference module tracks a belief distribution over a ghost's location.
     This is an abstract class, which you should not modify.
@@ -65,9 +68,11 @@ class InferenceModule:
         observations are stored at the time the GameState object is created, so
         changing the position of the ghost will not affect the functioning of
         observeState.
+
+        The ghost is placed with an AgentState owned by this gameState that is
+        reused by later placements in it (see placeQueryGhost).
         """
-        conf = game.Configuration(ghostPosition, game.Directions.STOP)
-        gameState.data.agentStates[self.index] = game.AgentState(conf, False)
+        placeQueryGhost(gameState, self.index, ghostPosition)
         return gameState
 
     def observeState(self, gameState):
@@ -82,8 +87,69 @@ class InferenceModule:
         "Initializes beliefs to a uniform distribution over all positions."
         # The legal positions do not include the ghost prison cells in the bottom left.
         self.legalPositions = [p for p in gameState.getWalls().asList(False) if p[1] > 1]
+        # Strings cache their hash, so this is cheap to look up on every move
+        self.layoutKey = str(gameState.getWalls())
+        self.indexPositions(gameState)
         self.initializeUniformly(gameState)
 
+    def indexPositions(self, gameState):
+        """
+        Numbers every position the ghost can be in: the open cells of the
+        layout in the same order as TransitionMatrix, followed by the jail
+        cell if it is not open.
+        """
+        self.positions = gameState.getWalls().asList(False)
+        if self.getJailPosition() not in self.positions:
+            self.positions.append(self.getJailPosition())
+        self.positionIndex = dict((p, i) for i, p in enumerate(self.positions))
+        self.legalIndices = [self.positionIndex[p] for p in self.legalPositions]
+        legalIndices = set(self.legalIndices)
+        self.illegalIndices = [i for i in range(len(self.positions)) if i not in legalIndices]
+        self.isLegalIndex = [i in legalIndices for i in range(len(self.positions))]
+        self.distanceVectors = {}
+
+    def getDistanceVector(self, pacmanPosition):
+        """
+        Returns the manhattan distance from Pacman to every indexed position.
+        Vectors are kept for every Pacman position seen.
+        """
+        if pacmanPosition not in self.distanceVectors:
+            self.distanceVectors[pacmanPosition] = [util.manhattanDistance(p, pacmanPosition)
+                                                    for p in self.positions]
+        return self.distanceVectors[pacmanPosition]
+
+    def getTransitionMatrix(self, gameState, indices=None):
+        """
+        Returns the ghost's transition model in gameState as a TransitionMatrix.
+
+        When the ghost agent tells us what its moves depend on (see
+        getTransitionKey), the matrix comes from transitionCache, so a layout,
+        Pacman position and ghost type seen before costs no getDistribution
+        calls at all.  Otherwise the matrix is built for this call only, and if
+        indices is given only those positions get rows.
+        """
+        key = getTransitionKey(self.ghostAgent, self.layoutKey, gameState)
+        if key == None:
+            return self.compileTransitionMatrix(gameState, indices)
+        return transitionCache.getMatrix(key, lambda: self.compileTransitionMatrix(gameState))
+
+    def compileTransitionMatrix(self, gameState, indices=None):
+        """
+        Builds the ghost's transition model from gameState with a row for every
+        legal position (or every legal position in indices).  Other open cells
+        (such as the jail) get no row.
+        """
+        matrix = TransitionMatrix(gameState.getWalls())
+        legalPositions = set(self.legalPositions)
+        if indices != None:
+            legalPositions = legalPositions.intersection([self.positions[i] for i in indices])
+        for oldPos in matrix.positions:
+            if oldPos in legalPositions:
+                matrix.addRow(self.getPositionDistribution(self.setGhostPosition(gameState, oldPos)))
+            else:
+                matrix.addRow(None)
+        return matrix
+
     ######################################
     # Methods that need to be overridden #
     ######################################
@@ -111,13 +177,62 @@ class ExactInference(InferenceModule):
     """
     The exact dynamic inference module should use forward-algorithm
     updates to compute the exact belief function at each time step.
+
+    Beliefs are sparse: only positions with nonzero probability are stored,
+    and updates only visit those, so once observations narrow the ghost
+    down, each step costs time in proportion to the belief's support rather
+    than to the board.  Positions whose probability falls below
+    pruneEpsilon are dropped as well.
+
+    getBeliefDistribution is the only public view of the beliefs; the sparse
+    dict behind it, self.sparseBeliefs, is internal to this class.
+
+    With logSpace set, beliefs are kept as log probabilities and normalized
+    with logSumExp, so they never underflow however long the game runs.
     """
 
+    def __init__(self, ghostAgent, logSpace=False, pruneEpsilon=0.0):
+        InferenceModule.__init__(self, ghostAgent)
+        self.logSpace = logSpace
+        self.pruneEpsilon = pruneEpsilon
+
     def initializeUniformly(self, gameState):
-        "Begin with a uniform distribution over ghost positions."
-        self.beliefs = util.Counter()
-        for p in self.legalPositions: self.beliefs[p] = 1.0
-        self.beliefs.normalize()
+        """
+        Begin with a uniform distribution over ghost positions.
+
+        Beliefs are kept in self.sparseBeliefs, a {position index: probability} dict
+        (log probabilities with logSpace) over indices into self.positions
+        (see indexPositions), holding only nonzero probabilities.
+        """
+        prob = 1.0 / len(self.legalIndices)
+        beliefs = dict([(i, prob) for i in self.legalIndices])
+        self.setBeliefs(beliefs, False)
+
+    def setBeliefs(self, beliefs, isLog):
+        """
+        Normalizes and prunes the {index: probability} or {index: log
+        probability} dict beliefs, then stores it in the form logSpace asks for.
+        """
+        if isLog:
+            total = logSumExp(beliefs.values())
+            if total != LOG_ZERO:
+                beliefs = dict([(i, value - total) for i, value in beliefs.items()])
+            probs = None
+        else:
+            beliefs = normalizeBeliefs(beliefs)
+            probs = beliefs
+        if self.pruneEpsilon > 0 and len(beliefs) > 1:
+            threshold = self.pruneEpsilon
+            if isLog: threshold = math.log(threshold)
+            pruned = dict([(i, value) for i, value in beliefs.items() if value >= threshold])
+            if pruned and len(pruned) < len(beliefs):
+                return self.setBeliefs(pruned, isLog)
+        if self.logSpace and not isLog:
+            beliefs = dict([(i, math.log(prob)) for i, prob in beliefs.items()])
+        elif isLog and not self.logSpace:
+            beliefs = dict([(i, math.exp(value)) for i, value in beliefs.items()])
+        self.sparseBeliefs = beliefs
+        self.beliefCounter = None
 
     def observe(self, observation, gameState):
         """
@@ -142,25 +257,31 @@ class ExactInference(InferenceModule):
 
         """
         noisyDistance = observation
-        emissionModel = busters.getObservationDistribution(noisyDistance)
-        pacmanPosition = gameState.getPacmanPosition()
-
-        allPossible = util.Counter()
 
         if noisyDistance == None:
-            allPossible[self.getJailPosition()] = 1.0
+            self.setBeliefs({self.positionIndex[self.getJailPosition()]: 1.0}, False)
+            return
+
+        distances = self.getDistanceVector(gameState.getPacmanPosition())
+        isLegal = self.isLegalIndex
+        allPossible = {}
+        if self.logSpace:
+            logEmissionModel = getLogObservationDistribution(noisyDistance)
+            for i, logBelief in self.sparseBeliefs.iteritems():
+                if isLegal[i] and distances[i] in logEmissionModel:
+                    allPossible[i] = logBelief + logEmissionModel[distances[i]]
         else:
-            for p in self.legalPositions:
-                trueDistance = util.manhattanDistance(p, pacmanPosition)
-                if emissionModel[trueDistance] > 0:
-                    allPossible[p] = self.beliefs[p] * emissionModel[trueDistance]      # downweight based on probability
-            allPossible.normalize()
-
-        self.beliefs = allPossible
+            emissionModel = busters.getObservationDistribution(noisyDistance)
+            for i, belief in self.sparseBeliefs.iteritems():
+                if isLegal[i]:
+                    emission = emissionModel.get(distances[i], 0)
+                    if emission > 0:
+                        allPossible[i] = belief * emission      # downweight based on probability
+        self.setBeliefs(allPossible, self.logSpace)
 
     def elapseTime(self, gameState):
         """
-        Update self.beliefs in response to a time step passing from the current state.
+        Update the beliefs in response to a time step passing from the current state.
 
         The transition model is not entirely stationary: it may depend on Pacman's
         current position (e.g., for DirectionalGhost).  However, this is not a problem,
@@ -207,19 +328,193 @@ class ExactInference(InferenceModule):
         combine to give us a belief distribution over new positions after a time update from a particular position
         """
 
-        allPossible = util.Counter()
-        pacmanPosition = gameState.getPacmanPosition()
-        
-        for oldPos in self.legalPositions:
-            newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, oldPos))
-            for newPos, prob in newPosDist.items():
-                allPossible[newPos] += self.beliefs[oldPos] * prob      # marginal probability given sum of possible transitions
-        allPossible.normalize()
-        self.beliefs = allPossible
-        
+        # marginal probability given sum of possible transitions; belief on
+        # positions with no row in the matrix (the jail) is dropped
+        beliefs = self.sparseBeliefs
+        if self.logSpace and beliefs:
+            # Propagate exp(logBelief - max), so the likeliest position keeps weight 1
+            scale = max(beliefs.values())
+            beliefs = dict([(i, math.exp(value - scale)) for i, value in beliefs.items()])
+        transitionMatrix = self.getTransitionMatrix(gameState, beliefs.keys())
+        self.setBeliefs(transitionMatrix.multiplySparse(beliefs), False)
 
     def getBeliefDistribution(self):
-        return self.beliefs
+        if self.beliefCounter == None:
+            beliefs = util.Counter()
+            if not self.sparseBeliefs:
+                for p in self.legalPositions: beliefs[p] = 0.0
+            for i, belief in self.sparseBeliefs.items():
+                if self.logSpace: belief = math.exp(belief)
+                beliefs[self.positions[i]] = belief
+            self.beliefCounter = beliefs
+        return self.beliefCounter
+
+class TransitionMatrix:
+    """
+    A ghost's transition model compiled into a sparse matrix over the open
+    cells of a layout, indexed in walls.asList(False) order.  It is stored in
+    compressed sparse row form: the successors of position i are
+    columns[rowStarts[i]:rowStarts[i+1]], with their probabilities at the same
+    offsets in probs.  Rows are added in index order with addRow.
+    """
+
+    def __init__(self, walls):
+        self.positions = walls.asList(False)
+        self.positionIndex = dict((p, i) for i, p in enumerate(self.positions))
+        self.rowStarts = array.array('l', [0])
+        self.columns = array.array('l')
+        self.probs = array.array('d')
+
+    def addRow(self, successorDist):
+        """
+        Appends the row for the next position from a {successor: probability}
+        dict, or an empty row if successorDist is None.
+        """
+        if successorDist != None:
+            for successor, prob in successorDist.items():
+                self.columns.append(self.positionIndex[successor])
+                self.probs.append(prob)
+        self.rowStarts.append(len(self.columns))
+
+    def multiply(self, vector):
+        "Returns the distribution one time step after the distribution vector"
+        result = [0.0] * len(vector)
+        rowStarts, columns, probs = self.rowStarts, self.columns, self.probs
+        for i in xrange(len(rowStarts) - 1):
+            mass = vector[i]
+            if mass:
+                for k in xrange(rowStarts[i], rowStarts[i + 1]):
+                    result[columns[k]] += mass * probs[k]
+        return result
+
+    def multiplySparse(self, distribution):
+        """
+        Like multiply for a {position index: mass} dict, visiting only the
+        positions in it.  Returns a dict of the nonzero results.
+        """
+        result = {}
+        get = result.get
+        rowStarts, columns, probs = self.rowStarts, self.columns, self.probs
+        numRows = len(rowStarts) - 1
+        for i, mass in distribution.iteritems():
+            if i >= numRows or not mass: continue
+            for k in xrange(rowStarts[i], rowStarts[i + 1]):
+                column = columns[k]
+                result[column] = get(column, 0.0) + mass * probs[k]
+        return result
+
+class TransitionMatrixCache:
+    """
+    A least recently used cache of compiled TransitionMatrix objects.  Keys
+    come from getTransitionKey, so a matrix can be shared by every inference
+    module and every game on the same layout.
+    """
+
+    def __init__(self, maxSize=500):
+        self.maxSize = maxSize
+        self.matrices = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def getMatrix(self, key, compileMatrix):
+        "Returns the matrix stored under key, calling compileMatrix() to build it if needed"
+        matrix = self.matrices.pop(key, None)
+        if matrix == None:
+            self.misses += 1
+            matrix = compileMatrix()
+            if len(self.matrices) >= self.maxSize:
+                self.matrices.popitem(last=False)
+        else:
+            self.hits += 1
+        self.matrices[key] = matrix
+        return matrix
+
+    def clear(self):
+        self.matrices.clear()
+
+# One cache of transition matrices is shared by every inference module
+transitionCache = TransitionMatrixCache()
+
+def getTransitionKey(agent, layoutKey, gameState):
+    """
+    Returns a key that identifies the agent's transition model in gameState,
+    or None if it can not be cached.  Agents with stationaryTransitions set
+    move the same way everywhere on a layout.  Other agents may define
+    getTransitionKey(state), which returns everything besides the layout that
+    their getDistribution depends on (or None) when the ghost is placed
+    unscared, as placeQueryGhost does.  Neither kind may depend on the
+    positions of other ghosts.
+    """
+    if getattr(agent, 'stationaryTransitions', False):
+        return (agent.__class__, layoutKey)
+    if hasattr(agent, 'getTransitionKey'):
+        agentKey = agent.getTransitionKey(gameState)
+        if agentKey != None:
+            return (agent.__class__, layoutKey, agentKey)
+    return None
+
+def systematicResample(weights, n):
+    """
+    Draws n indices into weights (which must have a positive sum, but need
+    not be normalized) by systematic resampling: n evenly spaced points with
+    one random offset are walked along the cumulative weights.  Returns the
+    indices in increasing order as an array, in O(n + len(weights)) time.
+    """
+    step = float(sum(weights)) / n
+    point = random.random() * step
+    indices = array.array('l')
+    cumulative = 0.0
+    drawn = 0
+    for i, weight in enumerate(weights):
+        if not weight: continue
+        cumulative += weight
+        while point < cumulative and drawn < n:
+            indices.append(i)
+            point += step
+            drawn += 1
+        last = i
+    # rounding can leave the final point just past the total
+    while drawn < n:
+        indices.append(last)
+        drawn += 1
+    return indices
+
+LOG_ZERO = float('-inf')
+
+def logSumExp(logVector):
+    "Returns the log of the sum of the exps of logVector without leaving log space"
+    if not logVector: return LOG_ZERO
+    scale = max(logVector)
+    if scale == LOG_ZERO: return LOG_ZERO
+    return scale + math.log(sum([math.exp(value - scale) for value in logVector]))
+
+def expScaledVector(logVector):
+    """
+    Returns exp(value - max) for each log value, a list of weights whose
+    largest is exactly one, or None if every value is LOG_ZERO.
+    """
+    scale = max(logVector)
+    if scale == LOG_ZERO: return None
+    return [math.exp(value - scale) for value in logVector]
+
+logObservationDistributions = {}
+def getLogObservationDistribution(noisyDistance):
+    """
+    Returns the log of busters.getObservationDistribution(noisyDistance) as a
+    {trueDistance: log probability} dict; missing distances have probability
+    zero, so look them up with .get(distance, LOG_ZERO).
+    """
+    if noisyDistance not in logObservationDistributions:
+        distribution = busters.getObservationDistribution(noisyDistance)
+        logObservationDistributions[noisyDistance] = dict([(distance, math.log(prob))
+                                                           for distance, prob in distribution.items() if prob > 0])
+    return logObservationDistributions[noisyDistance]
+
+def normalizeBeliefs(beliefs):
+    "Scales a {key: probability} dict to sum to one; an all zero dict is returned as is"
+    total = float(sum(beliefs.values()))
+    if total == 0: return beliefs
+    return dict([(key, value / total) for key, value in beliefs.items()])
 
 class ParticleFilter(InferenceModule):
     """
@@ -228,12 +523,20 @@ class ParticleFilter(InferenceModule):
     Useful helper functions will include random.choice, which chooses
     an element from a list uniformly at random, and util.sample, which
     samples a key from a Counter by treating its values as probabilities.
+
+    Particles are stored in self.particleIndices, an array of indices into
+    self.positions, and resampled with systematicResample, so each update is
+    linear in the number of particles.  self.particles is a ParticleList, a
+    view of the same particles as positions that reads and writes
+    particleIndices; assigning a list of positions to it replaces them.  With
+    logSpace set, particle weights are computed as log probabilities.
     """
 
 
-    def __init__(self, ghostAgent, numParticles=300):
+    def __init__(self, ghostAgent, numParticles=300, logSpace=False):
         InferenceModule.__init__(self, ghostAgent);
         self.setNumParticles(numParticles)
+        self.logSpace = logSpace
 
     def setNumParticles(self, numParticles):
         self.numParticles = numParticles
@@ -252,8 +555,23 @@ class ParticleFilter(InferenceModule):
             dictionary (where there could be an associated weight with each position) is incorrect
             and will produce errors
         """
-        self.particles = [self.legalPositions[i % len(self.legalPositions)] for i in range(self.numParticles)]
+        legalIndices = self.legalIndices
+        self.particleIndices = array.array('l', [legalIndices[i % len(legalIndices)] for i in xrange(self.numParticles)])
+
+    def getParticles(self):
+        return ParticleList(self)
 
+    def setParticles(self, particles):
+        self.particleIndices = array.array('l', [self.positionIndex[p] for p in particles])
+
+    particles = property(getParticles, setParticles)
+
+    def getParticleCounts(self):
+        "Returns the number of particles at each position, indexed like self.positions"
+        counts = [0] * len(self.positions)
+        for i in self.particleIndices:
+            counts[i] += 1
+        return counts
 
     def observe(self, observation, gameState):
         """
@@ -285,23 +603,26 @@ class ParticleFilter(InferenceModule):
         """
 
         noisyDistance = observation
-        emissionModel = busters.getObservationDistribution(noisyDistance)
-        pacmanPosition = gameState.getPacmanPosition()
 
         if noisyDistance is not None:                                                   # Update belief distribution
-            belief = util.Counter()
-            for particle in self.particles:
-                trueDistance = util.manhattanDistance(particle, pacmanPosition)
-                belief[particle] += emissionModel[trueDistance]
-            belief.normalize()
-            if belief.totalCount() is 0:
+            distances = self.getDistanceVector(gameState.getPacmanPosition())
+            if self.logSpace:
+                logEmissionModel = getLogObservationDistribution(noisyDistance)
+                logWeights = [math.log(count) + logEmissionModel.get(distance, LOG_ZERO) if count else LOG_ZERO
+                              for count, distance in zip(self.getParticleCounts(), distances)]
+                weights = expScaledVector(logWeights)
+            else:
+                emissionModel = busters.getObservationDistribution(noisyDistance)
+                weights = [count * emissionModel[distance] if count else 0.0
+                           for count, distance in zip(self.getParticleCounts(), distances)]
+            if weights == None or sum(weights) == 0:
                 self.initializeUniformly(gameState)
             else:
-                self.particles = [util.sample(belief) for _ in range(self.numParticles)]
+                self.particleIndices = systematicResample(weights, self.numParticles)
 
         else:                                                                           # When a ghost is captured by Pacman, **all** particles should be updated so
-            jailLocation = self.getJailPosition()                                       # that the ghost appears in its prison cell, self.getJailPosition()
-            self.particles = [jailLocation for _ in range(self.numParticles)]
+            jailIndex = self.positionIndex[self.getJailPosition()]                      # that the ghost appears in its prison cell, self.getJailPosition()
+            self.particleIndices = array.array('l', [jailIndex]) * self.numParticles
 
 
     def elapseTime(self, gameState):
@@ -320,19 +641,20 @@ class ParticleFilter(InferenceModule):
         belief distribution
         """
 
-        allPossible = util.Counter()
-        pacmanPosition = gameState.getPacmanPosition()
-        
-        for p in self.particles:
-            newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, p))
-            for newPos, prob in newPosDist.items():
-                allPossible[newPos] += prob
-        allPossible.normalize()
-        
-        if allPossible.totalCount() is 0:
+        counts = self.getParticleCounts()
+        occupied = [i for i, count in enumerate(counts) if count]
+        allPossible = self.getTransitionMatrix(gameState, occupied).multiply(counts)
+        # The matrix has no rows for positions outside self.legalPositions
+        for i in self.illegalIndices:
+            if counts[i]:
+                newPosDist = self.getPositionDistribution(self.setGhostPosition(gameState, self.positions[i]))
+                for newPos, prob in newPosDist.items():
+                    allPossible[self.positionIndex[newPos]] += counts[i] * prob
+
+        if sum(allPossible) == 0:
             self.initializeUniformly(gameState)
         else:
-            self.particles = [util.sample(allPossible) for _ in range(self.numParticles)]
+            self.particleIndices = systematicResample(allPossible, self.numParticles)
 
 
     def getBeliefDistribution(self):
@@ -342,8 +664,8 @@ class ParticleFilter(InferenceModule):
           essentially converts a list of particles into a belief distribution (a Counter object)
         """
         beliefs = util.Counter()
-        for particle in self.particles:
-            beliefs[particle] += 1
+        for i, count in enumerate(self.getParticleCounts()):
+            if count: beliefs[self.positions[i]] = count
         beliefs.normalize()
         return beliefs
 
@@ -365,17 +687,72 @@ class MarginalInference(InferenceModule):
 
     def getBeliefDistribution(self):
         "Returns the marginal belief over a particular ghost by summing out the others."
-        jointDistribution = jointInference.getBeliefDistribution()
-        dist = util.Counter()
-        for t, prob in jointDistribution.items():
-            dist[t[self.index - 1]] += prob
-        return dist
+        return jointInference.getMarginalDistribution(self.index - 1)
+
+class ParticleList:
+    """
+    The particles of a ParticleFilter as a sequence of positions.  This is a
+    view, not a copy: items are looked up in the filter's particleIndices
+    when read and stored there when assigned, so it always shows the
+    current particles.  Use list(view) for a snapshot.
+    """
+
+    def __init__(self, particleFilter):
+        self.particleFilter = particleFilter
 
-class JointParticleFilter:
-    "JointParticleFilter tracks a joint distribution over tuples of all ghost positions."
+    def __len__(self):
+        return len(self.particleFilter.particleIndices)
 
-    def __init__(self, numParticles=600):
+    def __getitem__(self, i):
+        positions = self.particleFilter.positions
+        if isinstance(i, slice):
+            return [positions[k] for k in self.particleFilter.particleIndices[i]]
+        return positions[self.particleFilter.particleIndices[i]]
+
+    def __setitem__(self, i, position):
+        positionIndex = self.particleFilter.positionIndex
+        if isinstance(i, slice):
+            self.particleFilter.particleIndices[i] = array.array('l', [positionIndex[p] for p in position])
+        else:
+            self.particleFilter.particleIndices[i] = positionIndex[position]
+
+    def __iter__(self):
+        positions = self.particleFilter.positions
+        return iter([positions[k] for k in self.particleFilter.particleIndices])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+class JointParticleFilter(object):
+    """
+    JointParticleFilter tracks a joint distribution over tuples of all ghost positions.
+
+    When every ghost moves independently of the others (see
+    movesIndependently) and factored is set, the joint distribution is the
+    product of one distribution per ghost, so after the first update each
+    ghost is tracked by its own ParticleFilter instead.  This is opt-in, as
+    it draws different random numbers than the joint filter.  self.particles
+    still gives joint particles, pairing up the ghosts' particles at random
+    with a private random.Random, so reading them leaves the random module
+    alone.
+
+    With logSpace set, the weight of a particle is summed from the ghosts' log
+    emission probabilities rather than multiplied, so it can not underflow
+    however many ghosts there are.
+    """
+
+    def __init__(self, numParticles=600, factored=False, logSpace=False):
         self.setNumParticles(numParticles)
+        self.factored = factored
+        self.pairingRandom = random.Random(0)
+        self.logSpace = logSpace
+        self.ghostFilters = None
 
     def setNumParticles(self, numParticles):
         self.numParticles = numParticles
@@ -384,9 +761,45 @@ class JointParticleFilter:
         "Stores information about the game, then initializes particles."
         self.numGhosts = gameState.getNumAgents() - 1
         self.ghostAgents = []
+        self.ghostFilters = None
+        self.independent = False
         self.legalPositions = legalPositions
         self.initializeParticles()
 
+    def getParticles(self):
+        if self.ghostFilters == None:
+            return self.jointParticles
+        marginals = []
+        for ghostFilter in self.ghostFilters:
+            particles = list(ghostFilter.particles)
+            self.pairingRandom.shuffle(particles)
+            marginals.append(particles)
+        return zip(*marginals)
+
+    def setParticles(self, particles):
+        self.jointParticles = particles
+        if self.ghostFilters != None:
+            for i, ghostFilter in enumerate(self.ghostFilters):
+                ghostFilter.particles = [particle[i] for particle in particles]
+
+    particles = property(getParticles, setParticles)
+
+    def getGhostFilters(self, gameState):
+        """
+        Returns the per-ghost ParticleFilters, splitting the joint particles
+        into them the first time this is called once every ghost is known to
+        move independently, or None if the joint particles are in use.
+        """
+        if self.ghostFilters == None and self.independent:
+            jointParticles = self.jointParticles
+            self.ghostFilters = []
+            for i, agent in enumerate(self.ghostAgents):
+                ghostFilter = ParticleFilter(agent, self.numParticles, self.logSpace)
+                ghostFilter.initialize(gameState)
+                ghostFilter.particles = [particle[i] for particle in jointParticles]
+                self.ghostFilters.append(ghostFilter)
+        return self.ghostFilters
+
     def initializeParticles(self):
         """
         Initialize particles to be consistent with a uniform prior.  
@@ -409,14 +822,31 @@ class JointParticleFilter:
             and will produce errors
 
         """
-        options = list(itertools.product(self.legalPositions, repeat=self.numGhosts))
-        random.shuffle(options)
+        numPositions = len(self.legalPositions)
+        numOptions = numPositions ** self.numGhosts
+        if numOptions <= self.numParticles:
+            options = list(itertools.product(self.legalPositions, repeat=self.numGhosts))
+            random.shuffle(options)
+        else:
+            # Draw distinct tuples by their number in the product, without listing it
+            chosen = set()
+            options = []
+            while len(options) < self.numParticles:
+                n = random.randrange(numOptions)
+                if n in chosen: continue
+                chosen.add(n)
+                particle = []
+                for i in range(self.numGhosts):
+                    n, position = divmod(n, numPositions)
+                    particle.append(self.legalPositions[position])
+                options.append(tuple(particle))
         self.particles = [options[i % len(options)] for i in range(self.numParticles)]
-        
 
     def addGhostAgent(self, agent):
         "Each ghost agent is registered separately and stored (in case they are different)."
         self.ghostAgents.append(agent)
+        if len(self.ghostAgents) == self.numGhosts:
+            self.independent = self.factored and all([movesIndependently(a) for a in self.ghostAgents])
 
     def getJailPosition(self, i):
         return (2 * i + 1, 1);
@@ -453,6 +883,11 @@ class JointParticleFilter:
         that performs these three operations for you.
 
         """
+        ghostFilters = self.getGhostFilters(gameState)
+        if ghostFilters != None:
+            for ghostFilter in ghostFilters: ghostFilter.observeState(gameState)
+            return
+
         pacmanPosition = gameState.getPacmanPosition()
         noisyDistances = gameState.getNoisyGhostDistances()
         if len(noisyDistances) < self.numGhosts: return
@@ -460,20 +895,39 @@ class JointParticleFilter:
 
         belief = util.Counter()
 
-        for particle in self.particles:
-            prob = 1.0
-            for i in range(self.numGhosts):
-                if noisyDistances[i] is None:
-                    particle = self.getParticleWithGhostInJail(particle, i)
-                else:
-                    trueDistance = util.manhattanDistance(particle[i], pacmanPosition)
-                    prob *= emissionModels[i][trueDistance]
-            belief[particle] += prob
+        if self.logSpace:
+            logEmissionModels = [getLogObservationDistribution(dist) for dist in noisyDistances]
+            logProbs = {}
+            for particle in self.particles:
+                logProb = 0.0
+                for i in range(self.numGhosts):
+                    if noisyDistances[i] is None:
+                        particle = self.getParticleWithGhostInJail(particle, i)
+                    else:
+                        trueDistance = util.manhattanDistance(particle[i], pacmanPosition)
+                        logProb += logEmissionModels[i].get(trueDistance, LOG_ZERO)
+                logProbs[particle] = logProb
+                belief[particle] += 1
+            # Weigh the particle counts by exp(logProb - max) to keep them representable
+            scale = max(logProbs.values())
+            for particle in belief.keys():
+                if scale == LOG_ZERO: belief[particle] = 0
+                else: belief[particle] *= math.exp(logProbs[particle] - scale)
+        else:
+            for particle in self.particles:
+                prob = 1.0
+                for i in range(self.numGhosts):
+                    if noisyDistances[i] is None:
+                        particle = self.getParticleWithGhostInJail(particle, i)
+                    else:
+                        trueDistance = util.manhattanDistance(particle[i], pacmanPosition)
+                        prob *= emissionModels[i][trueDistance]
+                belief[particle] += prob
 
         belief.normalize()
         if belief.totalCount() > 0:
             # print belief.totalCount()
-            self.particles = [util.sample(belief) for i in range(self.numParticles)]
+            self.particles = util.Sampler(belief).nSample(self.numParticles)
         else:
             self.initializeParticles()
             for particle in self.particles:
@@ -527,12 +981,20 @@ class JointParticleFilter:
               The ghost agent you are meant to supply is self.ghostAgents[ghostIndex-1],
               but in this project all ghost agents are always the same.
         """
+        ghostFilters = self.getGhostFilters(gameState)
+        if ghostFilters != None:
+            for ghostFilter in ghostFilters: ghostFilter.elapseTime(gameState)
+            return
+
+        # Particles at the same positions share one set of samplers, one per ghost
+        samplers = {}
         newParticles = []
         for oldParticle in self.particles:
-            newParticle = list(oldParticle) # A list of ghost positions
-            for i in range(self.numGhosts):
-                newParticle[i] = util.sample(getPositionDistributionForGhost(setGhostPositions(gameState, list(oldParticle)), i, self.ghostAgents[i]))
-            newParticles.append(tuple(newParticle))
+            if oldParticle not in samplers:
+                setGhostPositions(gameState, oldParticle)
+                samplers[oldParticle] = [util.Sampler(getPositionDistributionForGhost(gameState, i, self.ghostAgents[i]))
+                                         for i in range(self.numGhosts)]
+            newParticles.append(tuple([sampler.sample() for sampler in samplers[oldParticle]]))
         self.particles = newParticles
 
     def getBeliefDistribution(self):
@@ -542,9 +1004,27 @@ class JointParticleFilter:
         beliefs.normalize()
         return beliefs
 
+    def getMarginalDistribution(self, ghostIndex):
+        "Returns the belief over the position of one ghost, summing out the others."
+        if self.ghostFilters != None:
+            return self.ghostFilters[ghostIndex].getBeliefDistribution()
+        beliefs = util.Counter()
+        for particle in self.particles:
+            beliefs[particle[ghostIndex]] += 1
+        beliefs.normalize()
+        return beliefs
+
 # One JointInference module is shared globally across instances of MarginalInference
 jointInference = JointParticleFilter()
 
+def movesIndependently(agent):
+    """
+    True if the agent's moves never depend on where the other ghosts are.
+    Agents whose transitions can be cached (see getTransitionKey) qualify,
+    since a cached transition model can not depend on the other ghosts.
+    """
+    return getattr(agent, 'stationaryTransitions', False) or hasattr(agent, 'getTransitionKey')
+
 def getPositionDistributionForGhost(gameState, ghostIndex, agent):
     """
     Returns the distribution over positions for a ghost, using the supplied gameState.
@@ -562,7 +1042,30 @@ def getPositionDistributionForGhost(gameState, ghostIndex, agent):
 def setGhostPositions(gameState, ghostPositions):
     "Sets the position of all ghosts to the values in ghostPositionTuple."
     for index, pos in enumerate(ghostPositions):
-        conf = game.Configuration(pos, game.Directions.STOP)
-        gameState.data.agentStates[index + 1] = game.AgentState(conf, False)
+        placeQueryGhost(gameState, index + 1, pos)
     return gameState
 
+class QueryAgentState(game.AgentState):
+    "An AgentState that placeQueryGhost put into one gameState and moves around in it"
+
+# The Configurations that placeQueryGhost uses, which are never modified
+queryConfigurations = {}
+
+def placeQueryGhost(gameState, index, position):
+    """
+    Places ghost index in gameState, unscared at position and facing STOP, so
+    its agent can be asked where it would move.  The first placement puts a
+    new QueryAgentState into the gameState and later ones move it, so
+    repeated queries do not allocate.  That AgentState belongs to this
+    gameState alone: copies of the state copy it, and other gameStates get
+    their own.  Configurations are shared per position.
+    """
+    conf = queryConfigurations.get(position)
+    if conf == None:
+        conf = queryConfigurations[position] = game.Configuration(position, game.Directions.STOP)
+    agentState = gameState.data.agentStates[index]
+    if not isinstance(agentState, QueryAgentState):
+        agentState = gameState.data.agentStates[index] = QueryAgentState(conf, False)
+    agentState.configuration = conf
+    agentState.scaredTimer = 0
+
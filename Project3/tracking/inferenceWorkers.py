@@ -0,0 +1,160 @@
+# inferenceWorkers.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+This file contains an InferenceWorkerPool, which runs the inference modules
+of a BustersAgent in child processes so the ghosts are tracked in parallel.
+
+Example:
+pool = InferenceWorkerPool(inferenceModules, 4)
+beliefs = pool.initialize(gameState)
+beliefs = pool.update(gameState, elapse=True, observe=True)
+pool.close()
+
+Each worker is forked with its share of the modules and keeps them for the
+whole game, along with a copy of the initial game state without the ghosts.
+Every turn the pool only sends Pacman's configuration and the noisy ghost
+distances; the worker puts them into its copy of the state, updates its
+modules and sends their belief distributions back.  The modules in the
+parent process are not updated while the pool is running.
+"""
+
+import multiprocessing
+import random
+import traceback
+
+import inference
+
+class InferenceWorkerPool:
+    """
+    Runs a list of inference modules in up to numWorkers child processes.
+    The workers' random seeds are drawn from a private random.Random seeded
+    with seed, so starting them does not advance the random module.
+    """
+
+    def __init__(self, inferenceModules, numWorkers, seed=None):
+        self.inferenceModules = inferenceModules
+        self.numWorkers = max(1, min(numWorkers, len(inferenceModules)))
+        self.seeds = random.Random(seed)
+        self.workers = []
+
+    def initialize(self, gameState):
+        """
+        Starts the workers, initializes every module on gameState and returns
+        their belief distributions.
+        """
+        self.close()
+        for slots in self.assignModules():
+            modules = [self.inferenceModules[slot] for slot in slots]
+            self.workers.append(InferenceWorker(slots, modules, self.seeds.getrandbits(32)))
+        state = gameState.deepCopy()
+        agents = state.data.agentStates
+        state.data.agentStates = [agents[0]] + [None for i in range(1, len(agents))]
+        return self.collect([('initialize', state) for worker in self.workers])
+
+    def update(self, gameState, elapse, observe):
+        """
+        Runs elapseTime (if elapse) and observeState (if observe) on every
+        module for the new gameState and returns their belief distributions.
+        """
+        message = ('update', gameState.data.agentStates[0].configuration,
+                   gameState.getNoisyGhostDistances(), elapse, observe)
+        return self.collect([message for worker in self.workers])
+
+    def close(self):
+        "Stops the workers; initialize starts new ones."
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
+
+    def assignModules(self):
+        """
+        Splits the module indices between the workers.  MarginalInference
+        modules all share inference.jointInference, so they stay together.
+        """
+        shared = [i for i, inf in enumerate(self.inferenceModules)
+                  if isinstance(inf, inference.MarginalInference)]
+        groups = [[i] for i in range(len(self.inferenceModules)) if i not in shared]
+        if len(shared) > 0:
+            groups.insert(0, shared)
+        assignments = [[] for i in range(min(self.numWorkers, len(groups)))]
+        for n, group in enumerate(groups):
+            assignments[n % len(assignments)].extend(group)
+        return assignments
+
+    def collect(self, messages):
+        "Sends one message to each worker, then gathers the beliefs in module order."
+        for worker, message in zip(self.workers, messages):
+            worker.connection.send(message)
+        beliefs = [None for inf in self.inferenceModules]
+        for worker in self.workers:
+            status, result = worker.connection.recv()
+            if status == 'error':
+                self.close()
+                raise Exception, 'Inference worker failed:\n' + result
+            for slot, belief in zip(worker.slots, result):
+                beliefs[slot] = belief
+        return beliefs
+
+class InferenceWorker:
+    "A child process holding the inference modules at the given slots."
+
+    def __init__(self, slots, modules, seed):
+        self.slots = slots
+        self.connection, childConnection = multiprocessing.Pipe()
+        # Forked workers would otherwise all draw the same random numbers
+        self.process = multiprocessing.Process(target=runWorker, args=(modules, childConnection, seed))
+        self.process.daemon = True
+        self.process.start()
+        childConnection.close()
+
+    def close(self):
+        try:
+            self.connection.send(('close',))
+        except (IOError, EOFError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+def runWorker(modules, connection, seed):
+    "The loop run by each worker process"
+    random.seed(seed)
+    gameState = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        command = message[0]
+        if command == 'close':
+            break
+        try:
+            if command == 'initialize':
+                gameState = message[1]
+                for inf in modules: inf.initialize(gameState)
+            elif command == 'update':
+                configuration, ghostDistances, elapse, observe = message[1:]
+                gameState.data.agentStates[0].configuration = configuration
+                gameState.data.ghostDistances = ghostDistances
+                for inf in modules:
+                    if elapse: inf.elapseTime(gameState)
+                    if observe: inf.observeState(gameState)
+            connection.send(('ok', [inf.getBeliefDistribution() for inf in modules]))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+    connection.close()
@@ -14,7 +14,8 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, ReadOnlyGrid
+import copy
 import os
 import random
 
@@ -23,6 +24,13 @@ VISIBILITY_MATRIX_CACHE = {}
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Game states share their Layout instead of copying it, so a Layout must
+    not be modified once a game has started: code that needs a different
+    board should change a deepCopy() of it.  The walls are a ReadOnlyGrid, so
+    an agent changing the Grid from state.getWalls() gets a TypeError instead
+    of changing the board of every state; the walls of a deepCopy() are an
+    ordinary Grid.
     """
 
     def __init__(self, layoutText):
@@ -34,6 +42,7 @@ class Layout:
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
+        self.walls = ReadOnlyGrid(self.walls)
         self.layoutText = layoutText
         # self.initializeVisibilityMatrix()
 
@@ -90,7 +99,14 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        "Copies the layout's grids and lists without parsing its text again"
+        layout = copy.copy(self)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.layoutText = self.layoutText[:]
+        return layout
 
     def processLayoutText(self, layoutText):
         """
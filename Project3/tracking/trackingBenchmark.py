@@ -0,0 +1,251 @@
+# trackingBenchmark.py
+# --------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Headless benchmark of the inference modules in inference.py.
+
+For every layout, inference module, particle count and ghost count this
+plays one game of busters without graphics and records the per step
+latency of elapseTime and observeState (50th, 90th and 99th percentile),
+the total runtime, the peak resident memory and the mean L2 error of the
+beliefs against ExactInference run on the same game.  Pacman moves at
+random and the random module is reseeded after every move, as the
+autograder's tracking tests do, so every configuration with the same seed
+sees the same ghost moves and noisy distances.  Each run happens in a
+child process so it gets its own memory measurement and can be stopped
+after a timeout.
+
+Examples:
+> python trackingBenchmark.py --csv tracking.csv
+> python trackingBenchmark.py -l bigHunt -i ParticleFilter -n 300,3000,30000 -k 1,4
+"""
+
+import optparse
+import os
+import sys
+import time
+import csv
+import random
+import multiprocessing
+import resource
+import Queue
+
+import busters
+import bustersAgents
+import ghostAgents
+import inference
+import layout
+import textDisplay
+import util
+from game import Directions
+
+FIELDS = ['layout', 'inference', 'numParticles', 'numGhosts', 'ghost', 'status', 'steps',
+          'elapseP50', 'elapseP90', 'elapseP99', 'observeP50', 'observeP90', 'observeP99',
+          'time', 'maxRSS', 'l2Error']
+
+INFERENCE_TYPES = ['ExactInference', 'ParticleFilter', 'MarginalInference']
+PARTICLE_INFERENCE_TYPES = ['ParticleFilter', 'MarginalInference']
+
+class BenchmarkAgent(bustersAgents.BustersAgent):
+    """
+    A BustersAgent that times its inference modules, compares their beliefs
+    to ExactInference and moves at random.
+    """
+
+    def __init__(self, inferenceModules, ghosts, seed):
+        self.inferenceModules = inferenceModules
+        self.referenceModules = [inference.ExactInference(a) for a in ghosts]
+        self.observeEnable = True
+        self.elapseTimeEnable = True
+        self.numWorkers = 0
+        self.workerPool = None
+        self.seed = seed
+        self.moveChooser = random.Random(seed)
+        self.numMoves = 0
+        self.elapseTimes = []
+        self.observeTimes = []
+        self.errors = []
+
+    def registerInitialState(self, gameState):
+        bustersAgents.BustersAgent.registerInitialState(self, gameState)
+        for reference in self.referenceModules: reference.initialize(gameState)
+
+    def getAction(self, gameState):
+        "Updates and times the beliefs, then moves at random."
+        if not self.firstMove:
+            startTime = time.time()
+            for inf in self.inferenceModules: inf.elapseTime(gameState)
+            self.elapseTimes.append(time.time() - startTime)
+        startTime = time.time()
+        for inf in self.inferenceModules: inf.observeState(gameState)
+        self.observeTimes.append(time.time() - startTime)
+
+        # The reference modules do not use random, so they cannot change the game
+        for reference in self.referenceModules:
+            if not self.firstMove: reference.elapseTime(gameState)
+            reference.observeState(gameState)
+        for inf, reference in zip(self.inferenceModules, self.referenceModules):
+            self.errors.append(l2Distance(inf.getBeliefDistribution(), reference.getBeliefDistribution()))
+        self.firstMove = False
+
+        self.numMoves += 1
+        random.seed(self.seed + self.numMoves)
+        legal = [a for a in gameState.getLegalPacmanActions() if a != Directions.STOP]
+        return self.moveChooser.choice(legal)
+
+def l2Distance(dist, refDist):
+    "The L2 distance between two distributions given as Counters"
+    keys = set(dist.keys()) | set(refDist.keys())
+    return sum([(dist[key] - refDist[key]) ** 2 for key in keys]) ** 0.5
+
+def percentile(values, fraction):
+    "The value below which the given fraction of values lie (nearest rank)"
+    if len(values) == 0: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def makeInferenceModules(inferenceName, numParticles, ghosts):
+    inferenceType = util.lookup(inferenceName, vars(inference))
+    if inferenceName == 'ExactInference':
+        return [inferenceType(a) for a in ghosts]
+    if inferenceName == 'MarginalInference':
+        inference.jointInference = inference.JointParticleFilter(numParticles)
+        return [inferenceType(a) for a in ghosts]
+    return [inferenceType(a, numParticles) for a in ghosts]
+
+def runOne(layoutName, inferenceName, numParticles, numGhosts, ghostName, maxMoves, seed, results):
+    "Plays a single game in a child process and puts its row on results"
+    random.seed(seed)
+    ghostType = util.lookup(ghostName, vars(ghostAgents))
+    ghosts = [ghostType(i + 1) for i in range(numGhosts)]
+    pacman = BenchmarkAgent(makeInferenceModules(inferenceName, numParticles, ghosts), ghosts, seed)
+    lay = layout.getLayout(layoutName)
+    util.mutePrint()
+    try:
+        startTime = time.time()
+        busters.runGames(lay, pacman, ghosts, textDisplay.NullGraphics(), 1, maxMoves)
+        elapsed = time.time() - startTime
+    finally:
+        util.unmutePrint()
+    ms = lambda t: t != None and round(t * 1000, 3) or t
+    results.put({'status': 'ok',
+                 'steps': pacman.numMoves,
+                 'elapseP50': ms(percentile(pacman.elapseTimes, 0.5)),
+                 'elapseP90': ms(percentile(pacman.elapseTimes, 0.9)),
+                 'elapseP99': ms(percentile(pacman.elapseTimes, 0.99)),
+                 'observeP50': ms(percentile(pacman.observeTimes, 0.5)),
+                 'observeP90': ms(percentile(pacman.observeTimes, 0.9)),
+                 'observeP99': ms(percentile(pacman.observeTimes, 0.99)),
+                 'time': round(elapsed, 4),
+                 'maxRSS': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 'l2Error': round(sum(pacman.errors) / max(1, len(pacman.errors)), 6)})
+
+def runChild(layoutName, inferenceName, numParticles, numGhosts, ghostName, maxMoves, seed, results):
+    try:
+        runOne(layoutName, inferenceName, numParticles, numGhosts, ghostName, maxMoves, seed, results)
+    except Exception, e:
+        results.put({'status': 'error: %s' % e})
+
+def benchmark(layoutName, inferenceName, numParticles, numGhosts, options):
+    row = dict((field, None) for field in FIELDS)
+    row.update({'layout': layoutName, 'inference': inferenceName, 'numParticles': numParticles or '-',
+                'numGhosts': numGhosts, 'ghost': options.ghost})
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=runChild,
+                                    args=(layoutName, inferenceName, numParticles, numGhosts,
+                                          options.ghost, options.maxMoves, options.seed, results))
+    child.start()
+    child.join(options.timeout)
+    if child.is_alive():
+        child.terminate()
+        child.join()
+        row['status'] = 'timeout'
+        row['time'] = options.timeout
+    else:
+        try:
+            row.update(results.get(timeout=1))
+        except Queue.Empty:
+            row['status'] = 'crashed'
+    return row
+
+def getLayoutNames():
+    return sorted([f[:-4] for f in os.listdir('layouts') if f.endswith('Hunt.lay')])
+
+def getMaxGhosts(layoutName):
+    return len([1 for isPacman, pos in layout.getLayout(layoutName).agentPositions if not isPacman])
+
+def runBenchmarks(options):
+    layoutNames = options.layouts and options.layouts.split(',') or getLayoutNames()
+    inferenceNames = options.inference.split(',')
+    particleCounts = [int(n) for n in options.numParticles.split(',')]
+    ghostCounts = [int(k) for k in options.numGhosts.split(',')]
+
+    rows = []
+    for layoutName in layoutNames:
+        maxGhosts = getMaxGhosts(layoutName)
+        for numGhosts in ghostCounts:
+            if numGhosts > maxGhosts:
+                continue
+            for inferenceName in inferenceNames:
+                if inferenceName in PARTICLE_INFERENCE_TYPES:
+                    runs = particleCounts
+                else:
+                    runs = [None]
+                for numParticles in runs:
+                    row = benchmark(layoutName, inferenceName, numParticles, numGhosts, options)
+                    print '%-10s %-18s %7s %2d ghosts %-8s %8s s  elapse p50 %8s ms  observe p50 %8s ms  l2 %s' % (
+                        row['layout'], row['inference'], row['numParticles'], row['numGhosts'],
+                        row['status'][:8], row['time'], row['elapseP50'], row['observeP50'], row['l2Error'])
+                    sys.stdout.flush()
+                    rows.append(row)
+    return rows
+
+def writeCSV(rows, path):
+    f = open(path, 'wb')
+    try:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writerow(dict((field, field) for field in FIELDS))
+        writer.writerows(rows)
+    finally:
+        f.close()
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Benchmark the inference modules in inference.py')
+    parser.add_option('-l', '--layouts', dest = 'layouts', default = None,
+                      help = 'comma separated layouts to run (default: every *Hunt layout)')
+    parser.add_option('-i', '--inference', dest = 'inference', default = ','.join(INFERENCE_TYPES),
+                      help = 'comma separated inference modules to run (default %default)')
+    parser.add_option('-n', '--numParticles', dest = 'numParticles', default = '300,1000,5000',
+                      help = 'comma separated particle counts for the particle filters (default %default)')
+    parser.add_option('-k', '--numGhosts', dest = 'numGhosts', default = '1,2,4',
+                      help = 'comma separated ghost counts; counts above a layout\'s ghosts are skipped (default %default)')
+    parser.add_option('-g', '--ghosts', dest = 'ghost', default = 'RandomGhost',
+                      help = 'the ghost agent type in ghostAgents.py (default %default)')
+    parser.add_option('-m', '--maxMoves', dest = 'maxMoves', type = 'int', default = 100,
+                      help = 'moves before a game is stopped (default %default)')
+    parser.add_option('-s', '--seed', dest = 'seed', type = 'int', default = 188,
+                      help = 'random seed shared by every run (default %default)')
+    parser.add_option('-t', '--timeout', dest = 'timeout', type = 'float', default = 300,
+                      help = 'seconds before a single run is stopped (default %default)')
+    parser.add_option('--csv', dest = 'csvPath', default = None,
+                      help = 'write the results to this CSV file')
+    (options, args) = parser.parse_args(argv)
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    rows = runBenchmarks(options)
+    if options.csvPath:
+        writeCSV(rows, options.csvPath)
@@ -409,6 +409,8 @@ class DoubleInferenceAgent(bustersAgents.BustersAgent):
                     self.errors += 1
 
 class SeededRandomGhostAgent(Agent):
+    stationaryTransitions = True
+
     def __init__(self, index):
         self.index = index;
 
@@ -443,6 +445,8 @@ class SeededRandomGhostAgent(Agent):
         return values[i]
 
 class GoSouthAgent(Agent):
+    stationaryTransitions = True
+
     def __init__(self, index):
         self.index = index;
 